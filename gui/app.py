@@ -1,3 +1,4 @@
+from PySide6.QtCore import QTimer
 from PySide6.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -10,6 +11,8 @@ from gui.pages import (
     STTPage,
     TranslatorPage,
 )
+from state import lock, shared, stt_model_requests
+from utils import timing
 
 
 class MainWindow(QMainWindow):
@@ -32,10 +35,51 @@ class MainWindow(QMainWindow):
         self.tabs.addTab(self.translator_page, "Translator")
         self.tabs.addTab(self.broadcast_page, "Broadcast")
 
+        # El Segmenter relee shared["settings"] en cada pasada: cambios en vivo
+        self.listener_page.settingsChanged.connect(self._on_listener_settings)
+
+        # El STT carga el modelo nuevo en segundo plano y cambia entre segmentos
+        self.stt_page.modelChanged.connect(self._on_model_changed)
+
+        # Refresca los medidores desde `shared` (los workers no tocan la GUI)
+        self._broadcast_clients = None
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self._refresh_from_shared)
+        self.refresh_timer.start(100)
+
+    def _refresh_from_shared(self):
+        with lock:
+            db = shared["current_db"]
+            floor = shared["noise_floor_db"]
+            threshold = shared["threshold_db"]
+            broadcast_clients = shared["broadcast_clients"]
+        self.set_db_value(db)
+        if floor is not None:
+            self.set_noise_floor_value(floor, threshold)
+        else:
+            # umbral fijo: no hay piso de ruido que mostrar
+            self.listener_page.clear_noise_floor()
+        # el broadcast publica una lista nueva cada stats_interval
+        if broadcast_clients is not self._broadcast_clients:
+            self._broadcast_clients = broadcast_clients
+            self.broadcast_page.set_client_stats(broadcast_clients)
+
+    def _on_listener_settings(self, cfg: dict):
+        with lock:
+            settings = shared["settings"]
+            settings.silence_threshold_db = cfg["silence_threshold_db"]
+            settings.adaptive_threshold = cfg["adaptive_threshold"]
+
+    def _on_model_changed(self, cfg: dict):
+        stt_model_requests.put((cfg["model"], cfg["compute"]))
+
     # Helpers para que el backend pueda acceder rápido
     def set_db_value(self, db: float):
         self.listener_page.set_db(db)
 
+    def set_noise_floor_value(self, floor_db: float, threshold_db: float):
+        self.listener_page.set_noise_floor(floor_db, threshold_db)
+
     def append_transcription_preview(self, text: str):
         self.stt_page.append_transcript(text)
 
@@ -54,5 +98,6 @@ def run_gui():
 
     window = MainWindow()
     window.show()
+    timing.mark("GUI shown")
 
     app.exec()
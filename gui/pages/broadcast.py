@@ -44,7 +44,8 @@ class BroadcastPage(QWidget):
         btn_row.addWidget(self.stop_btn)
         layout.addLayout(btn_row)
 
-        layout.addWidget(QLabel("Connected clients"))
+        self.clients_label = QLabel("Connected clients")
+        layout.addWidget(self.clients_label)
         self.clients_list = QListWidget()
         layout.addWidget(self.clients_list, stretch=1)
 
@@ -85,3 +86,20 @@ class BroadcastPage(QWidget):
 
     def add_client(self, name: str):
         self.clients_list.addItem(name)
+
+    def set_client_stats(self, rows: list[dict], limit: int = 200):
+        """Per-client lag from shared["broadcast_clients"] (slowest first);
+        only the first `limit` rows are listed.
+        """
+        lagging = sum(1 for row in rows if row["lag"] >= 1.0)
+        self.clients_label.setText(
+            f"Connected clients: {len(rows)} ({lagging} lagging >1s)"
+        )
+        self.set_clients(
+            [
+                f"{row['username']} [{row['language']}] — lag {row['lag']:.1f}s, "
+                f"queued {row['queued']}, dropped {row['dropped']}, "
+                f"{row['buffered'] // 1024} KB buffered"
+                for row in rows[:limit]
+            ]
+        )
@@ -2,6 +2,7 @@ from typing import Optional
 
 from PySide6.QtCore import Qt, Signal, Slot
 from PySide6.QtWidgets import (
+    QCheckBox,
     QGridLayout,
     QHBoxLayout,
     QLabel,
@@ -13,6 +14,8 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
+from models.segmenter_settings import SegmenterSettings
+
 
 class ListenerPage(QWidget):
     # Señales para que el backend conecte
@@ -47,13 +50,19 @@ class ListenerPage(QWidget):
         meter_layout.addWidget(self.db_bar)
         layout.addLayout(meter_layout)
 
+        self.noise_floor_label = QLabel("Noise floor: - | Threshold: -")
+        layout.addWidget(self.noise_floor_label)
+
         # Controls grid
         grid = QGridLayout()
         grid.addWidget(QLabel("Silence threshold (dB)"), 0, 0)
         self.threshold_spin = QSpinBox()
         self.threshold_spin.setRange(-100, 0)
-        self.threshold_spin.setValue(-40)
+        self.threshold_spin.setValue(int(SegmenterSettings.silence_threshold_db))
         grid.addWidget(self.threshold_spin, 0, 1)
+        self.adaptive_check = QCheckBox("Adaptive (noise floor + margin)")
+        self.adaptive_check.setChecked(SegmenterSettings.adaptive_threshold)
+        grid.addWidget(self.adaptive_check, 0, 2)
 
         grid.addWidget(QLabel("Min voice (ms)"), 1, 0)
         self.min_voice_spin = QSpinBox()
@@ -97,6 +106,7 @@ class ListenerPage(QWidget):
             self.pre_roll_spin,
         ):
             w.valueChanged.connect(self._emit_settings)
+        self.adaptive_check.toggled.connect(self._emit_settings)
 
     @Slot()
     def _on_start(self):
@@ -113,6 +123,7 @@ class ListenerPage(QWidget):
     def _emit_settings(self):
         cfg = {
             "silence_threshold_db": float(self.threshold_spin.value()),
+            "adaptive_threshold": self.adaptive_check.isChecked(),
             "voice_time_to_unidle_ms": int(self.min_voice_spin.value()),
             "min_silence_ms": int(self.min_silence_spin.value()),
             "pre_roll_ms": int(self.pre_roll_spin.value()),
@@ -128,3 +139,13 @@ class ListenerPage(QWidget):
             db = 0
         self.db_bar.setValue(int(db))
         self.db_label.setText(f"dB: {db:.1f}")
+
+    @Slot(float, float)
+    def set_noise_floor(self, floor_db: float, threshold_db: float):
+        self.noise_floor_label.setText(
+            f"Noise floor: {floor_db:.1f} dB | Threshold: {threshold_db:.1f} dB"
+        )
+
+    @Slot()
+    def clear_noise_floor(self):
+        self.noise_floor_label.setText("Noise floor: - | Threshold: -")
@@ -11,6 +11,8 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
+from models.stt_settings import STTSettings
+
 
 class STTPage(QWidget):
     startRequested = Signal()
@@ -30,14 +32,25 @@ class STTPage(QWidget):
         hl = QHBoxLayout()
         hl.addWidget(QLabel("Model"))
         self.model_combo = QComboBox()
-        self.model_combo.addItems(["tiny", "base", "small", "medium"])
+        # el texto es el tamaño, el dato el modelo real (solo inglés, language="en")
+        for size in ["tiny", "base", "small", "medium"]:
+            self.model_combo.addItem(size, f"{size}.en")
+        self.model_combo.setCurrentIndex(
+            max(0, self.model_combo.findData(STTSettings.model))
+        )
         hl.addWidget(self.model_combo)
 
         hl.addWidget(QLabel("Compute"))
         self.compute_combo = QComboBox()
         self.compute_combo.addItems(["int8", "float32"])
+        self.compute_combo.setCurrentText(STTSettings.compute_type)
         hl.addWidget(self.compute_combo)
         layout.addLayout(hl)
+        if STTSettings.workers > 1:
+            # el pool de procesos no cambia de modelo en caliente
+            for combo in (self.model_combo, self.compute_combo):
+                combo.setEnabled(False)
+                combo.setToolTip("Fixed while STT runs with several workers")
 
         btn_layout = QHBoxLayout()
         self.start_btn = QPushButton("Start STT")
@@ -72,7 +85,7 @@ class STTPage(QWidget):
     def _emit_model(self):
         self.modelChanged.emit(
             {
-                "model": self.model_combo.currentText(),
+                "model": self.model_combo.currentData(),
                 "compute": self.compute_combo.currentText(),
             }
         )
@@ -1,25 +1,33 @@
+import multiprocessing
 from threading import Thread
 
-from gui import app
-from workers import broadcast, listener, stt, translator
+from utils import timing
 
 
 def main():
+    from workers import broadcast, listener, stt, translator
+
     # Make a thread for every worker:
     listener_t = Thread(target=listener.run_listener, daemon=True)
     stt_t = Thread(target=stt.run_stt, daemon=True)
     translator_t = Thread(target=translator.run_translator, daemon=True)
     broadcast_t = Thread(target=broadcast.run_broadcast, daemon=True)
 
-    # Start the Threads
-    listener_t.start()
+    # Start the Threads (STT first: loading Whisper is the slowest part, and
+    # the listener queues segments meanwhile)
     stt_t.start()
+    listener_t.start()
     translator_t.start()
     broadcast_t.start()
+    timing.mark("workers started")
+
+    # Run the GUI (PySide6 is imported only now, while Whisper loads)
+    from gui import app
 
-    # Run the GUI
     app.run_gui()
 
 
 if __name__ == "__main__":
+    # Necesario para los procesos del pool STT en el build congelado
+    multiprocessing.freeze_support()
     main()
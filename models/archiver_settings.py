@@ -0,0 +1,18 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class ArchiverSettings:
+    enabled = False
+    folder = "segments"
+    # "flac" (comprimido, vía PyAV) o "wav" (int16)
+    format = "flac"
+    # cola acotada: si el disco no da abasto, "drop" descarta y "block" espera
+    # hasta block_timeout segundos antes de descartar
+    queue_size = 64
+    policy = "drop"
+    block_timeout = 0.25
+    batch_size = 16
+    # rotación de archivos por tamaño o por tiempo
+    rotate_bytes = 256 * 1024 * 1024
+    rotate_seconds = 3600.0
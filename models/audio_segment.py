@@ -0,0 +1,27 @@
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+
+@dataclass
+class AudioSegment:
+    """Audio cut by a Segmenter, as it travels through state.audio_queue."""
+
+    samples: np.ndarray
+    source_id: str = "default"
+    sample_rate: int = 16000
+    start_index: int = 0  # índice absoluto (muestras) del inicio en su fuente
+    # "partial": ventana creciente de un segmento aún abierto (stream_hypotheses);
+    # "final": el segmento cerrado. Los de un mismo segmento comparten utterance_id
+    kind: str = "final"
+    utterance_id: int = 0
+    # rango con voz según el VAD del listener, en muestras desde el inicio de
+    # samples: speech_start = pre-roll; speech_end None = hasta el final
+    speech_start: int = 0
+    speech_end: Optional[int] = None
+    # stream_partials: muestras del inicio que ya iban al final del trozo anterior
+    overlap: int = 0
+    # time.monotonic() al cortarlo (para los plazos de las colas)
+    captured_at: float = field(default_factory=time.monotonic)
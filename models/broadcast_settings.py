@@ -0,0 +1,22 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class BroadcastSettings:
+    # cola de envío por cliente (send_queue_size captions): un cliente lento no
+    # frena a los demás. Si se llena, send_policy: "drop_oldest" descarta la más
+    # vieja, "latest" deja solo la última y "disconnect" además corta al cliente
+    # que lleva más de disconnect_after segundos de atraso
+    send_queue_size = 16
+    send_policy = "drop_oldest"
+    disconnect_after = 5.0
+    # bytes pendientes en el socket de un cliente antes de esperar a que los lea
+    write_buffer_bytes = 64 * 1024
+    # un cliente que no termina el handshake en handshake_timeout s se corta; a
+    # los conectados se les manda un ping cada ping_interval s y el que no
+    # contesta en ping_timeout s se da por caído
+    handshake_timeout = 10.0
+    ping_interval = 20.0
+    ping_timeout = 20.0
+    # cada cuánto se publican las métricas por cliente en `shared` (s)
+    stats_interval = 0.5
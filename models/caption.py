@@ -0,0 +1,16 @@
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Caption:
+    """Text line moving from STT to the translator and the broadcaster."""
+
+    text: str
+    source_id: str = "default"
+    # "partial" se reemplaza por el siguiente caption del mismo utterance_id
+    kind: str = "final"
+    utterance_id: int = 0
+    lang: str = "en"  # idioma del texto
+    # captured_at del audio de origen (time.monotonic)
+    captured_at: float = field(default_factory=time.monotonic)
@@ -0,0 +1,17 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class QueueSettings:
+    # colas entre etapas: capacidad, política ("block", "drop_oldest" o "deadline")
+    # y, con "deadline", antigüedad máxima (s desde la captura) de lo que se procesa;
+    # cada etapa suma la latencia de las anteriores
+    audio_size = 32
+    audio_policy = "deadline"
+    audio_deadline = 8.0
+    transcript_size = 64
+    transcript_policy = "deadline"
+    transcript_deadline = 12.0
+    translated_size = 64
+    translated_policy = "deadline"
+    translated_deadline = 15.0
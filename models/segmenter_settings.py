@@ -9,3 +9,33 @@ class SegmenterSettings:
     min_segment_duration = 0.6
     min_speech_duration = 0.6
     min_silence_to_end = 0.35
+    # VAD backend: "energy" (solo el umbral de dB) u "onnx" (modelo neural)
+    vad_backend = "energy"
+    vad_model_path = ""
+    vad_threshold = 0.5
+    vad_window = 512
+    vad_context = 64
+    # frames con voz (según el VAD) que necesita una ventana para abrir segmento
+    vad_min_speech_frames = 1
+    # duración máxima de un segmento: se corta en el frame más silencioso de
+    # los últimos split_lookback segundos (0 = sin límite)
+    max_segment_duration = 15.0
+    split_lookback = 2.0
+    # emitir trozos parciales (solapados) mientras el segmento sigue abierto
+    stream_partials = False
+    partial_duration = 4.0
+    partial_overlap = 0.5
+    # streaming: mientras el segmento sigue abierto, mandar todo lo que lleva
+    # cada hypothesis_interval segundos para una transcripción parcial
+    # (tiene prioridad sobre stream_partials)
+    stream_hypotheses = False
+    hypothesis_interval = 0.5
+    # umbral adaptativo: piso de ruido (percentil móvil del nivel por frame) + margen
+    adaptive_threshold = False
+    noise_floor_percentile = 0.2
+    noise_floor_margin_db = 12.0
+    noise_floor_step_db = 0.5
+    # el primer segundo de audio fija el piso de ruido de entrada (percentil directo)
+    noise_floor_seed_seconds = 1.0
+    adaptive_min_threshold_db = -60.0
+    adaptive_max_threshold_db = -20.0
@@ -0,0 +1,25 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class STTSettings:
+    model = "small.en"
+    compute_type = "int8"
+    # batching: hasta batch_size segmentos por pasada; si ya hay cola, espera
+    # hasta batch_wait_ms a que lleguen más (1 = sin batching)
+    batch_size = 1
+    batch_wait_ms = 50
+    # procesos STT (1 = Whisper en el hilo del STT); cada uno carga su modelo
+    # con cpu_threads hilos (0 = núcleos / workers)
+    workers = 1
+    cpu_threads = 0
+    # un proceso que muere se reinicia; uno con un segmento por más de
+    # job_timeout s se da por colgado y se mata (el segmento queda sin texto)
+    job_timeout = 120.0
+    # modelos cargados que se guardan en memoria (LRU) para cambiar sin recargar;
+    # el total estimado no pasa de model_cache_mb (el modelo en uso nunca se descarta)
+    model_cache_mb = 1024
+    # los segmentos ya vienen cortados por el VAD del listener: decodificar solo su
+    # rango de voz (± clip_padding s) sin el VAD de Whisper (False = vad_filter)
+    trust_listener_vad = True
+    clip_padding = 0.1
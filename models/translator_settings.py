@@ -0,0 +1,48 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class TranslatorSettings:
+    # backend: "mymemory" (API remota) o "ctranslate2" (modelo local en CPU);
+    # local_models: langpair -> carpeta del modelo OPUS-MT convertido
+    # (con su source.spm y target.spm)
+    backend = "mymemory"
+    # cada línea se traduce a todos los target_langs; cada cliente recibe uno
+    source_lang = "en"
+    target_langs = ["es"]
+    local_models = {"en|es": "translation_models/opus-mt-en-es"}
+    local_threads = 0  # hilos de CTranslate2 (0 = automático)
+    local_compute_type = "int8"
+    local_beam_size = 2
+    local_max_batch = 32
+    # caché de traducciones: LRU en memoria delante de una base SQLite en disco,
+    # por texto normalizado + langpair; las entradas vencen a los cache_ttl segundos
+    cache_enabled = True
+    cache_path = "translation_cache.sqlite3"
+    cache_memory_entries = 2048
+    cache_disk_entries = 100_000
+    cache_ttl = 30 * 24 * 3600.0
+    # hasta max_in_flight pedidos a la vez por una Session con conexiones reusadas;
+    # los resultados salen en el orden de la transcripción. Una línea que tarda
+    # más de request_timeout segundos (en total) se descarta
+    max_in_flight = 4
+    request_timeout = 4.0
+    # agrupar líneas: con cola o pedidos en curso, lo que llega dentro de
+    # coalesce_window segundos se traduce en un solo pedido (hasta max_query_bytes,
+    # el límite de MyMemory), unido con coalesce_separator; 0 = una línea por pedido.
+    # Una línea sola con el traductor libre sale sin esperar
+    coalesce_window = 0.15
+    coalesce_separator = "\n"
+    max_query_bytes = 500
+    # API remota: cada intento tiene attempt_timeout s; si no responde en el p95 de
+    # las latencias recientes sale un segundo pedido igual y gana el primero
+    # (la Session admite entonces hasta 2 * max_in_flight conexiones).
+    # Tras breaker_failures fallos seguidos no se llama a la API por
+    # breaker_cooldown s: se usa secondary_backend ("" = el texto sin traducir)
+    attempt_timeout = 2.5
+    hedge_enabled = True
+    hedge_min_delay = 0.2
+    hedge_initial_delay = 0.8
+    breaker_failures = 3
+    breaker_cooldown = 30.0
+    secondary_backend = ""
@@ -1,18 +1,52 @@
 import threading
 from queue import Queue
 
+from models.audio_segment import AudioSegment
+from models.caption import Caption
+from models.queue_settings import QueueSettings
 from models.segmenter_settings import SegmenterSettings
+from utils.bounded_queue import BoundedQueue
 
 translator_enabled = True
 stt_enabled = True
 listener_enabled = True
 
-audio_queue = Queue()
-transcripted_text = Queue[str]()
-translated_text = Queue[str]()
+# Fuentes de audio del listener: un Segmenter por entrada, mismo device = mismo stream
+listener_sources = [{"type": "device", "device": None, "channel": 0, "id": "default"}]
+
+# colas acotadas: si una etapa se atrasa se pierden captions, no se acumula latencia
+audio_queue = BoundedQueue[AudioSegment](
+    QueueSettings.audio_size,
+    QueueSettings.audio_policy,
+    QueueSettings.audio_deadline,
+    name="audio",
+    replace_partials=True,
+)
+transcripted_text = BoundedQueue[Caption](
+    QueueSettings.transcript_size,
+    QueueSettings.transcript_policy,
+    QueueSettings.transcript_deadline,
+    name="transcripts",
+    replace_partials=True,
+)
+translated_text = BoundedQueue[Caption](
+    QueueSettings.translated_size,
+    QueueSettings.translated_policy,
+    QueueSettings.translated_deadline,
+    name="translations",
+    replace_partials=True,
+)
+# cambios de modelo pedidos desde la GUI: (model, compute_type)
+stt_model_requests = Queue[tuple[str, str]]()
 
 shared = {
     "current_db": 0.0,
+    "sources_db": {},  # source_id -> dB de la última ventana analizada
+    "noise_floor_db": None,  # piso de ruido estimado (umbral adaptativo)
+    "threshold_db": None,  # umbral en uso con el umbral adaptativo
     "settings": SegmenterSettings,
+    # métricas por cliente del broadcast (id, username, language, lag, queued,
+    # sent, dropped, buffered), el más atrasado primero
+    "broadcast_clients": [],
 }
 lock = threading.Lock()
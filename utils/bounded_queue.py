@@ -0,0 +1,129 @@
+import queue
+import time
+from typing import Optional
+
+
+class BoundedQueue(queue.Queue):
+    """queue.Queue with a capacity and a load-shedding policy.
+
+    policy:
+      "block"       put waits for room (the producer slows down)
+      "drop_oldest" put on a full queue discards the oldest item
+      "deadline"    like drop_oldest, and get also discards items whose
+                    captured_at is more than deadline seconds old
+
+    Items need a captured_at (time.monotonic) for "deadline". depth, dropped
+    and expired can be read at any time (stats() takes a snapshot).
+
+    With replace_partials, items of kind "partial" (streaming hypotheses) are
+    disposable: putting a newer item of the same utterance removes the queued
+    partials it supersedes, and a full queue drops its oldest partial before
+    any final.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        policy: str = "block",
+        deadline: Optional[float] = None,
+        name: str = "queue",
+        replace_partials: bool = False,
+    ):
+        if policy not in ("block", "drop_oldest", "deadline"):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        super().__init__(maxsize)
+        self.policy = policy
+        self.deadline = deadline if policy == "deadline" else None
+        self.name = name
+        self.replace_partials = replace_partials
+        self.dropped = 0  # discarded by put on a full queue
+        self.superseded = 0  # partials replaced by a newer item of their utterance
+        self.expired = 0  # discarded by get, past the deadline
+        self.max_depth = 0
+        self._ready_at = 0.0
+
+    @property
+    def depth(self) -> int:
+        return self.qsize()
+
+    def put(self, item, block=True, timeout=None):
+        if self.replace_partials:
+            with self.mutex:
+                self._supersede(item)
+        if self.policy == "block":
+            super().put(item, block, timeout)
+        else:
+            with self.not_full:
+                if 0 < self.maxsize <= self._qsize():
+                    self._drop_one()
+                    self.unfinished_tasks -= 1
+                    self.dropped += 1
+                    print(
+                        f"[QUEUE] {self.name} full, dropped oldest "
+                        f"({self.dropped} so far)"
+                    )
+                self._put(item)
+                self.unfinished_tasks += 1
+                self.not_empty.notify()
+        self.max_depth = max(self.max_depth, self.qsize())
+
+    def _drop_one(self):
+        if self.replace_partials:
+            for i, queued in enumerate(self.queue):
+                if queued.kind == "partial":
+                    del self.queue[i]
+                    return
+        self._get()
+
+    def _supersede(self, item):
+        key = _utterance_key(item)
+        kept = [
+            queued
+            for queued in self.queue
+            if queued.kind != "partial" or _utterance_key(queued) != key
+        ]
+        removed = len(self.queue) - len(kept)
+        if removed:
+            self.queue.clear()
+            self.queue.extend(kept)
+            self.unfinished_tasks -= removed
+            self.superseded += removed
+            self.not_full.notify(removed)
+
+    def get(self, block=True, timeout=None):
+        ends = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if ends is None else max(0.0, ends - time.monotonic())
+            item = super().get(block, remaining)
+            # what was captured while the consumer warmed up is never expired
+            if self.deadline is None or item.captured_at <= self._ready_at:
+                return item
+            age = time.monotonic() - item.captured_at
+            if age <= self.deadline:
+                return item
+            self.expired += 1
+            self.task_done()
+            print(
+                f"[QUEUE] {self.name}: skipped item {age:.1f}s old "
+                f"({self.expired} so far)"
+            )
+
+    def mark_ready(self):
+        """The consumer is up: items captured until now skip the deadline, so
+        segments queued during warm-up are processed, not expired.
+        """
+        self._ready_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.qsize(),
+            "max_depth": self.max_depth,
+            "dropped": self.dropped,
+            "expired": self.expired,
+            "superseded": self.superseded,
+        }
+
+
+def _utterance_key(item) -> tuple:
+    # translated captions of one utterance differ by language
+    return (item.source_id, item.utterance_id, getattr(item, "lang", None))
@@ -0,0 +1,32 @@
+import threading
+import time
+
+# reloj de arranque: main importa este módulo antes que nada
+_started = time.perf_counter()
+_marks: dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def mark(event: str):
+    """Record the first time an event happens, in seconds since startup."""
+    if event in _marks:
+        return
+    with _lock:
+        if event in _marks:
+            return
+        _marks[event] = time.perf_counter() - _started
+    print(f"[STARTUP] {event}: {_marks[event]:.2f}s")
+
+
+def elapsed(event: str):
+    """Seconds from startup to event, or None if it hasn't happened yet."""
+    return _marks.get(event)
+
+
+def report():
+    """Print every startup event recorded so far, in order."""
+    with _lock:
+        marks = sorted(_marks.items(), key=lambda kv: kv[1])
+    print("[STARTUP] Timing report:")
+    for event, t in marks:
+        print(f"[STARTUP]   {t:7.2f}s  {event}")
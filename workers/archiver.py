@@ -0,0 +1,183 @@
+import os
+import queue
+import threading
+import time
+import wave
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+
+from models.archiver_settings import ArchiverSettings
+from models.audio_segment import AudioSegment
+from workers.listener import float32_to_int16
+
+
+# ---------------------------
+# Escritores de archivo (int16 mono)
+# ---------------------------
+class _WavWriter:
+    def __init__(self, path: str, sample_rate: int):
+        self.path = path
+        self.bytes_written = 44  # cabecera RIFF
+        self._wav = wave.open(path, "wb")
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, pcm: np.ndarray):
+        self._wav.writeframes(pcm.tobytes())
+        self.bytes_written += pcm.nbytes
+
+    def close(self):
+        self._wav.close()
+
+
+class _FlacWriter:
+    def __init__(self, path: str, sample_rate: int):
+        import av
+
+        self.path = path
+        self.bytes_written = 0  # paquetes ya entregados por el encoder
+        self._container = av.open(path, "w", format="flac")
+        self._stream = self._container.add_stream("flac", rate=sample_rate)
+        self._stream.layout = "mono"
+        self._stream.format = "s16"
+        self._sample_rate = sample_rate
+
+    def write(self, pcm: np.ndarray):
+        import av
+
+        frame = av.AudioFrame.from_ndarray(
+            pcm.reshape(1, -1), format="s16", layout="mono"
+        )
+        frame.sample_rate = self._sample_rate
+        for packet in self._stream.encode(frame):
+            self.bytes_written += packet.size
+            self._container.mux(packet)
+
+    def close(self):
+        for packet in self._stream.encode(None):
+            self._container.mux(packet)
+        self._container.close()
+
+
+# ---------------------------
+# Archivador asíncrono de segmentos
+# ---------------------------
+class SegmentArchiver:
+    """Writes emitted segments to disk from its own thread.
+
+    Segmenters call submit, which never waits on the disk: segments go to a
+    bounded queue and, when it is full, are dropped ("drop") or waited on for
+    at most block_timeout ("block"). The writer drains up to batch_size
+    segments per wakeup, appends them to one rolling file per source (FLAC or
+    int16 WAV) and rotates files by size or age. Each file gets a .csv index
+    with the offset, stream position and wall-clock time of every segment.
+    Streamed partial chunks are written without their overlap, so the
+    archive holds each stretch of audio once.
+    """
+
+    def __init__(self, cfg: ArchiverSettings = ArchiverSettings()):
+        self.cfg = cfg
+        self.queue: queue.Queue[AudioSegment] = queue.Queue(maxsize=cfg.queue_size)
+        self.dropped = 0
+        self.written = 0
+        # source_id -> (writer, index, opened, samples)
+        self._files: dict[str, tuple] = {}
+        self._file_counter = 0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, segment: AudioSegment) -> bool:
+        try:
+            if self.cfg.policy == "block":
+                self.queue.put(segment, timeout=self.cfg.block_timeout)
+            else:
+                self.queue.put_nowait(segment)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"[ARCHIVER] Queue full, dropped segment ({self.dropped} so far)")
+            return False
+
+    def start(self):
+        os.makedirs(self.cfg.folder, exist_ok=True)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+
+    def _run(self):
+        while not self._stop_event.is_set() or not self.queue.empty():
+            try:
+                batch = [self.queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.cfg.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"[ARCHIVER] Error writing {len(batch)} segment(s): {e}")
+        for source_id in list(self._files):
+            self._close(source_id)
+        print("[ARCHIVER] stopped")
+
+    def _write_batch(self, batch: list[AudioSegment]):
+        now = time.time()
+        for seg in batch:
+            # the overlap already went out at the end of the previous chunk
+            pcm = float32_to_int16(seg.samples[seg.overlap :])
+            if not len(pcm):
+                continue
+            writer, index, opened, samples = self._file_for(seg, now)
+            writer.write(pcm)
+            index.write(
+                f"{samples / seg.sample_rate:.3f},{len(pcm) / seg.sample_rate:.3f},"
+                f"{seg.start_index + seg.overlap},{now:.3f}\n"
+            )
+            self._files[seg.source_id] = (writer, index, opened, samples + len(pcm))
+            self.written += 1
+        for _, index, _, _ in self._files.values():
+            index.flush()
+
+    def _file_for(self, seg: AudioSegment, now: float) -> tuple:
+        entry = self._files.get(seg.source_id)
+        if entry is not None:
+            writer, _, opened, _ = entry
+            too_old = now - opened >= self.cfg.rotate_seconds
+            # what the writer produced so far: the file on disk lags behind it
+            too_big = writer.bytes_written >= self.cfg.rotate_bytes
+            if not (too_old or too_big):
+                return entry
+            self._close(seg.source_id)
+
+        stamp = datetime.fromtimestamp(now).strftime("%Y%m%d_%H%M%S")
+        safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in seg.source_id)
+        self._file_counter += 1
+        base = os.path.join(
+            self.cfg.folder, f"{safe_id}_{stamp}_{self._file_counter:04d}"
+        )
+        if self.cfg.format == "wav":
+            writer = _WavWriter(base + ".wav", seg.sample_rate)
+        else:
+            writer = _FlacWriter(base + ".flac", seg.sample_rate)
+        index = open(base + ".csv", "w", encoding="utf-8")
+        index.write("offset_s,duration_s,start_index,archived_at\n")
+        entry = (writer, index, now, 0)
+        self._files[seg.source_id] = entry
+        print(f"[ARCHIVER] Writing {writer.path}")
+        return entry
+
+    def _close(self, source_id: str):
+        writer, index, _, _ = self._files.pop(source_id)
+        writer.close()
+        index.close()
@@ -0,0 +1,145 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from models.audio_segment import AudioSegment
+from models.segmenter_settings import SegmenterSettings
+from workers.listener import Segmenter
+from workers.sources import FileSource
+from workers.stt import transcribe_batch
+from workers.translator import translate_text
+from workers.vad import create_vad
+
+
+# ---------------------------
+# Transcripción por lotes de archivos grabados
+# ---------------------------
+def segment_file(
+    path: str, cfg: Optional[SegmenterSettings] = None, sample_rate: int = 16000
+) -> tuple[list[AudioSegment], float]:
+    """Run a file through the Segmenter as fast as it decodes.
+
+    Returns the segments in order and the file duration in seconds.
+    """
+    cfg = cfg or SegmenterSettings()
+    found: list[AudioSegment] = []
+    seg = Segmenter(
+        cfg=cfg,
+        sample_rate=sample_rate,
+        buffer_seconds=40,
+        chunk_duration=0.05,
+        pre_roll=0.2,
+        vad=create_vad(cfg),
+        source_id=os.path.basename(path),
+        sink=found.append,
+    )
+    total = 0
+    for block in FileSource(path, sample_rate, realtime=False, downmix=True).blocks():
+        seg.feed(block)
+        total += block.shape[0]
+    seg.flush()
+    return found, total / sample_rate
+
+
+def format_timestamp(seconds: float) -> str:
+    ms = int(round(seconds * 1000))
+    h, ms = divmod(ms, 3_600_000)
+    m, ms = divmod(ms, 60_000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+
+def write_srt(path: str, segments: list[AudioSegment], texts: list[str]):
+    with open(path, "w", encoding="utf-8") as f:
+        n = 0
+        for seg, text in zip(segments, texts):
+            if not text:
+                continue
+            n += 1
+            start = seg.start_index / seg.sample_rate
+            end = start + len(seg.samples) / seg.sample_rate
+            f.write(f"{n}\n{format_timestamp(start)} --> {format_timestamp(end)}\n")
+            f.write(f"{text}\n\n")
+
+
+def transcribe_file(
+    path: str,
+    out_path: str,
+    translate_to: Optional[str] = None,
+    model_size: str = "small.en",
+    compute_type: str = "int8",
+    batch_size: int = 8,
+    workers: int = 2,
+    cpu_threads: int = 0,
+):
+    """Subtitle a recorded file: segment, transcribe in parallel batches,
+    optionally translate, and write ordered SRT file(s).
+    """
+    from faster_whisper import WhisperModel
+
+    started = time.perf_counter()
+    segments, duration = segment_file(path)
+    print(f"[BATCH] {len(segments)} segments in {duration:.1f}s of audio")
+
+    # num_workers lets the model serve that many transcribe calls at once
+    model = WhisperModel(
+        model_size,
+        device="cpu",
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        num_workers=workers,
+    )
+
+    groups = [segments[i : i + batch_size] for i in range(0, len(segments), batch_size)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        texts = [
+            text
+            for group_texts in pool.map(
+                lambda g: transcribe_batch(model, g, batch_size), groups
+            )
+            for text in group_texts
+        ]
+    write_srt(out_path, segments, texts)
+    print(f"[BATCH] Transcript written to {out_path}")
+
+    if translate_to:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            translated = list(
+                pool.map(lambda t: translate_text(t, "en", translate_to), texts)
+            )
+        root, ext = os.path.splitext(out_path)
+        write_srt(f"{root}.{translate_to}{ext}", segments, translated)
+        print(f"[BATCH] Translation written to {root}.{translate_to}{ext}")
+
+    elapsed = time.perf_counter() - started
+    rtf = elapsed / duration if duration else 0.0
+    print(
+        f"[BATCH] Done in {elapsed:.1f}s for {duration:.1f}s of audio "
+        f"(RTF {rtf:.3f}, {1 / rtf if rtf else 0:.1f}x realtime)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Subtitle a recorded audio file")
+    parser.add_argument("input")
+    parser.add_argument("-o", "--output", help="SRT path (default: <input>.srt)")
+    parser.add_argument("--translate", metavar="LANG", help="also write LANG subs")
+    parser.add_argument("--model", default="small.en")
+    parser.add_argument("--compute", default="int8")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--cpu-threads", type=int, default=0)
+    args = parser.parse_args()
+
+    transcribe_file(
+        args.input,
+        args.output or os.path.splitext(args.input)[0] + ".srt",
+        translate_to=args.translate,
+        model_size=args.model,
+        compute_type=args.compute,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        cpu_threads=args.cpu_threads,
+    )
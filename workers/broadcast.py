@@ -1,15 +1,23 @@
 import json
 from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 
-from websocket_server import WebsocketServer
-
 import state
+from models.broadcast_settings import BroadcastSettings
+from models.caption import Caption
+from models.translator_settings import TranslatorSettings
+from state import lock, shared
+from utils import timing
+from workers.ws_server import Connection, WebSocketServer
 
 # Protocolo
 ORDER_SET_USERNAME = 1
+ORDER_SET_LANGUAGE = 2
 ORDER_BROADCAST_TEXT = 3
+# texto provisional: el siguiente mensaje con el mismo "utterance" lo reemplaza
+ORDER_BROADCAST_PARTIAL = 4
 
-# clients: client_id -> {"username": str}
+# clients: client_id -> {"username": str, "language": str}
+# (solo se toca desde el event loop del servidor)
 clients = {}
 
 
@@ -23,48 +31,114 @@ def run_webclient_server(host="0.0.0.0", port=5173, directory="webclient"):
     httpd.serve_forever()
 
 
-def new_client(client, server):
-    clients[client["id"]] = {"username": "anon"}
-    print(f"[Broadcast] Conectado: {client['id']}")
+def new_client(conn: Connection):
+    # hasta que elija con ORDER_SET_LANGUAGE recibe el primer idioma configurado
+    clients[conn.id] = {
+        "username": "anon",
+        "language": TranslatorSettings.target_langs[0],
+    }
+    print(f"[Broadcast] Conectado: {conn.id}")
 
 
-def client_left(client, server):
-    info = clients.get(client["id"], {"username": "anon"})
-    print(f"[Broadcast] Desconectado: {info['username']}")
-    clients.pop(client["id"], None)
+def client_left(conn: Connection):
+    info = clients.get(conn.id, {"username": "anon"})
+    if conn.too_slow:
+        print(
+            f"[Broadcast] Desconectado por lento: {info['username']} "
+            f"(más de {conn.disconnect_after:.0f}s de atraso)"
+        )
+    else:
+        print(f"[Broadcast] Desconectado: {info['username']}")
+    clients.pop(conn.id, None)
 
 
-def message_received(client, server, message):
+def message_received(conn: Connection, message: str):
     try:
         data = json.loads(message)
     except json.JSONDecodeError:
         return
+    if not isinstance(data, dict):
+        return
 
     if data.get("order") == ORDER_SET_USERNAME:
         username = data.get("username", "anon")
-        clients[client["id"]]["username"] = username
+        clients[conn.id]["username"] = username
         print(f"[Broadcast] Usuario set: {username}")
 
+    elif data.get("order") == ORDER_SET_LANGUAGE:
+        language = data.get("language")
+        if language not in TranslatorSettings.target_langs:
+            print(f"[Broadcast] Idioma no disponible: {language}")
+            return
+        clients[conn.id]["language"] = language
+        print(f"[Broadcast] Idioma set: {clients[conn.id]['username']} -> {language}")
 
-def broadcast_text(server: WebsocketServer, text: str):
-    payload = json.dumps({"order": ORDER_BROADCAST_TEXT, "text": text})
-    # Esta lib ya manda a todos con una sola llamada
-    server.send_message_to_all(payload)
+
+def send_message(server: WebSocketServer, language: str, message: bytes):
+    """Runs on the server loop: the same message bytes go to every client
+    subscribed to the language.
+    """
+    for conn in list(server.connections.values()):
+        info = clients.get(conn.id)
+        if info is not None and info["language"] == language:
+            conn.send(message)
+
+
+def publish_stats(server: WebSocketServer):
+    """Runs on the server loop every stats_interval: per-client lag, queue and
+    drops into shared["broadcast_clients"] for the GUI, slowest first.
+    """
+    rows = []
+    for conn in list(server.connections.values()):
+        info = clients.get(conn.id, {"username": "anon", "language": "?"})
+        rows.append({"id": conn.id, **info, **conn.stats()})
+    rows.sort(key=lambda row: row["lag"], reverse=True)
+    with lock:
+        shared["broadcast_clients"] = rows
+    server.loop.call_later(BroadcastSettings.stats_interval, publish_stats, server)
+
+
+def broadcast_text(server: WebSocketServer, caption: Caption):
+    payload = json.dumps(
+        {
+            "order": (
+                ORDER_BROADCAST_PARTIAL
+                if caption.kind == "partial"
+                else ORDER_BROADCAST_TEXT
+            ),
+            "text": caption.text,
+            "source": caption.source_id,
+            "utterance": caption.utterance_id,
+            "language": caption.lang,
+        }
+    )
+    # serializado y codificado una sola vez; el envío pasa al event loop
+    message = payload.encode("utf-8")
+    server.call_soon_threadsafe(send_message, server, caption.lang, message)
 
 
 def run_broadcast(host="0.0.0.0", port=8765):
     """
-    state.translated_text_queue debe ser queue.Queue[str]
+    state.translated_text debe ser una cola de Caption (utils.bounded_queue)
     """
-    server = WebsocketServer(host=host, port=port)
-    server.set_fn_new_client(new_client)
-    server.set_fn_client_left(client_left)
-    server.set_fn_message_received(message_received)
+    server = WebSocketServer(
+        host,
+        port,
+        on_connect=new_client,
+        on_message=message_received,
+        on_close=client_left,
+        send_queue=BroadcastSettings.send_queue_size,
+        send_policy=BroadcastSettings.send_policy,
+        disconnect_after=BroadcastSettings.disconnect_after,
+        write_buffer=BroadcastSettings.write_buffer_bytes,
+        open_timeout=BroadcastSettings.handshake_timeout,
+        ping_interval=BroadcastSettings.ping_interval,
+        ping_timeout=BroadcastSettings.ping_timeout,
+    )
 
     print(f"[Broadcast] Server en ws://{host}:{port}")
 
-    # Arranca el server en su propio hilo interno
-    # (run_forever bloquea, así que lo lanzamos en background)
+    # Arranca el server (asyncio, un solo hilo para todas las conexiones)
     import threading
 
     webclient_t = threading.Thread(target=run_webclient_server, daemon=True)
@@ -72,13 +146,18 @@ def run_broadcast(host="0.0.0.0", port=8765):
 
     t = threading.Thread(target=server.run_forever, daemon=True)
     t.start()
+    server.call_soon_threadsafe(publish_stats, server)
 
     print("[Broadcast] Loop principal consumiendo la queue...")
 
-    # Loop SYNC normal y corriente
+    # Loop SYNC: consume la queue y le pasa los mensajes al event loop
     while True:
-        text = state.translated_text.get()  # bloquea hasta que haya algo
-        if not text:
+        caption = state.translated_text.get()  # bloquea hasta que haya algo
+        # an empty final still has to replace the partials of its utterance
+        if not caption.text and not caption.utterance_id:
             continue
-        print(f"[Broadcast] Enviando: {text}")
-        broadcast_text(server, text)
+        print(f"[Broadcast] Enviando ({caption.source_id}): {caption.text}")
+        broadcast_text(server, caption)
+        if caption.text and not timing.elapsed("first caption"):
+            timing.mark("first caption")
+            timing.report()
@@ -1,52 +1,201 @@
+import contextlib
 import math
-import os
 import threading
 import time
-from datetime import datetime
-from typing import Optional
+from typing import Callable, Optional
 
 import numpy as np
-import sounddevice as sd
-from scipy.io import wavfile
 
 import state
+from models.archiver_settings import ArchiverSettings
+from models.audio_segment import AudioSegment
 from models.segmenter_settings import SegmenterSettings
 from state import lock, shared
+from utils import timing
+from workers.sources import create_source, source_key
+from workers.vad import EnergyVAD, VADBackend, create_vad
 
 
 # ---------------------------
 # Circular buffer rápido con numpy
 # ---------------------------
 class CircularBuffer:
-    def __init__(self, capacity_samples: int):
+    """Ring buffer de muestras float32 indexado por contador monotónico.
+
+    With spsc=True the buffer assumes a single producer (the audio callback)
+    and a single consumer (the analyzer): append takes no lock and publishes
+    its writes by bumping total_written last, and readers validate after
+    copying that the producer did not lap the range they read.
+    """
+
+    def __init__(self, capacity_samples: int, frame_size: int = 0, spsc=False):
         self.capacity = int(capacity_samples)
         self.buf = np.zeros(self.capacity, dtype=np.float32)
-        self.head = 0  # índice de escritura (siguiente)
-        self.size = 0  # número de muestras válidas en buffer
         self.total_written = 0  # contador monotónico de muestras escritas (global)
-        self.lock = threading.Lock()
+        self._write_end = 0  # total_written once the append in progress finishes
+        self._wake_at = 0  # total_written that wakes the consumer in wait_for
+        self._data_event = threading.Event()
+        self.spsc = bool(spsc)
+        self.lock = contextlib.nullcontext() if self.spsc else threading.Lock()
+
+        # Energía por frame (suma de cuadrados), mantenida junto al ring buffer.
+        # Frame f cubre las muestras [f * frame_size, (f + 1) * frame_size).
+        self.frame_size = int(frame_size)
+        self.frame_capacity = (
+            self.capacity // self.frame_size + 1 if self.frame_size > 0 else 0
+        )
+        self.frame_energy = np.zeros(self.frame_capacity, dtype=np.float64)
+        self.frames_written = 0  # contador monotónico de frames completos
+        self._frame_acc = 0.0  # energía acumulada del frame en curso
+        self._frame_fill = 0  # muestras acumuladas del frame en curso
+
+    @property
+    def head(self) -> int:
+        """Índice de escritura (siguiente), derivado de total_written."""
+        return self.total_written % self.capacity
+
+    @property
+    def size(self) -> int:
+        """Número de muestras válidas en buffer."""
+        return min(self.capacity, self.total_written)
 
     def append(self, data: np.ndarray):
         """Append array 1D float32 into circular buffer (may wrap)."""
-        data = np.asarray(data, dtype=np.float32)
+        data = np.asarray(data, dtype=np.float32)  # no copy if already float32
         n = data.shape[0]
         if n == 0:
             return
         with self.lock:
-            # posición donde empieza a escribir (head)
-            end_pos = (self.head + n) % self.capacity
-            if self.head + n <= self.capacity:
+            total = self.total_written
+            if n > self.capacity:
+                # only the newest capacity samples can be retained
+                total += n - self.capacity
+                data = data[-self.capacity :]
+                if self.frame_size > 0:
+                    self._skip_frames(total)
+            m = data.shape[0]
+            # announce the range being overwritten before touching the ring
+            self._write_end = total + m
+            head = total % self.capacity
+            if head + m <= self.capacity:
                 # no wrap
-                self.buf[self.head : self.head + n] = data
+                self.buf[head : head + m] = data
             else:
                 # wrap
-                first = self.capacity - self.head
-                self.buf[self.head :] = data[:first]
-                self.buf[: n - first] = data[first:]
-            # actualizar head y size
-            self.head = (self.head + n) % self.capacity
-            self.size = min(self.capacity, self.size + n)
-            self.total_written += n
+                first = self.capacity - head
+                self.buf[head:] = data[:first]
+                self.buf[: m - first] = data[first:]
+            if self.frame_size > 0:
+                self._accumulate_energy(data)
+            # publish last: readers never see an index before its samples
+            self.total_written = total + m
+        wake_at = self._wake_at
+        if self.total_written >= wake_at and not self._data_event.is_set():
+            self._data_event.set()
+
+    def _accumulate_energy(self, data: np.ndarray):
+        """Fold squared samples into per-frame energies (caller holds the lock)."""
+        fs = self.frame_size
+        sq = np.square(data, dtype=np.float64)
+        n = sq.shape[0]
+        pos = 0
+        if self._frame_fill:
+            # completar el frame que quedó a medias en el append anterior
+            take = min(fs - self._frame_fill, n)
+            self._frame_acc += float(sq[:take].sum())
+            self._frame_fill += take
+            pos = take
+            if self._frame_fill < fs:
+                return
+            self._push_frames(np.array([self._frame_acc]))
+            self._frame_acc = 0.0
+            self._frame_fill = 0
+        full = (n - pos) // fs
+        if full:
+            self._push_frames(sq[pos : pos + full * fs].reshape(full, fs).sum(axis=1))
+            pos += full * fs
+        if pos < n:
+            self._frame_acc = float(sq[pos:].sum())
+            self._frame_fill = n - pos
+
+    def _skip_frames(self, total: int):
+        """Realign the frame accumulator when samples before total were never
+        stored, so frame f still covers [f * frame_size, (f + 1) * frame_size).
+        """
+        self.frame_energy[:] = 0.0
+        self.frames_written = total // self.frame_size
+        # the skipped part of the current frame counts as silence
+        self._frame_acc = 0.0
+        self._frame_fill = total % self.frame_size
+
+    def _push_frames(self, energies: np.ndarray):
+        m = energies.shape[0]
+        written = self.frames_written
+        if m > self.frame_capacity:
+            energies = energies[-self.frame_capacity :]
+            written += m - self.frame_capacity
+            m = self.frame_capacity
+        start = written % self.frame_capacity
+        if start + m <= self.frame_capacity:
+            self.frame_energy[start : start + m] = energies
+        else:
+            first = self.frame_capacity - start
+            self.frame_energy[start:] = energies[:first]
+            self.frame_energy[: m - first] = energies[first:]
+        self.frames_written = written + m
+
+    def _clamp(self, start_total_idx: int, end_total_idx: int) -> tuple[int, int]:
+        latest_total = self.total_written
+        earliest_total = max(0, latest_total - self.capacity)
+        return max(start_total_idx, earliest_total), min(end_total_idx, latest_total)
+
+    def _lapped(self, start_total_idx: int) -> int:
+        """Samples at the start of a read the producer may have overwritten (spsc)."""
+        return (self._write_end - self.capacity) - start_total_idx
+
+    def _views(self, start_total_idx: int, end_total_idx: int):
+        with self.lock:
+            start, end = self._clamp(start_total_idx, end_total_idx)
+            if end <= start:
+                return start, ()
+            length = end - start
+            start_idx = start % self.capacity
+            if start_idx + length <= self.capacity:
+                return start, (self.buf[start_idx : start_idx + length],)
+            first = self.capacity - start_idx
+            return start, (self.buf[start_idx:], self.buf[: length - first])
+
+    def read_views(
+        self, start_total_idx: int, end_total_idx: int
+    ) -> tuple[np.ndarray, ...]:
+        """Zero-copy read of [start_total_idx, end_total_idx): one view, or two
+        when the range wraps. Views alias the ring, so they are only valid until
+        the producer writes capacity samples past their start; copy them (or use
+        read_into) if they must outlive that.
+        """
+        return self._views(start_total_idx, end_total_idx)[1]
+
+    def read_into(
+        self, start_total_idx: int, end_total_idx: int, out: np.ndarray
+    ) -> int:
+        """Copy [start_total_idx, end_total_idx) into out and return the number of
+        samples n written. As with read_range_by_total_index, only the retained
+        part is copied: out[:n] holds the newest n samples of the range.
+        """
+        if end_total_idx <= start_total_idx:
+            return 0
+        start, views = self._views(start_total_idx, end_total_idx)
+        n = 0
+        for v in views:
+            out[n : n + v.shape[0]] = v
+            n += v.shape[0]
+        if self.spsc and n:
+            # the producer may have lapped the oldest samples while we copied
+            lapped = min(self._lapped(start), n)
+            if lapped > 0:
+                out[: n - lapped] = out[lapped:n]
+                n -= lapped
+        return n
 
     def read_range_by_total_index(
         self, start_total_idx: int, end_total_idx: int
@@ -55,30 +204,66 @@ class CircularBuffer:
         start/end are absolute sample indices in the stream (monotonic).
         If requested range is partially out of retained buffer, returns available part.
         """
-        if end_total_idx <= start_total_idx:
+        with self.lock:
+            start, end = self._clamp(start_total_idx, end_total_idx)
+        if end <= start:
             return np.array([], dtype=np.float32)
+        out = np.empty(end - start, dtype=np.float32)
+        return out[: self.read_into(start, end, out)]
+
+    def read_frame_energies(self, start_frame: int, end_frame: int) -> np.ndarray:
+        """Copy of per-frame energies (sum of squares) for [start_frame, end_frame).
+        Like read_range_by_total_index, returns only the part still retained.
+        """
+        if end_frame <= start_frame or self.frame_size <= 0:
+            return np.array([], dtype=np.float64)
 
         with self.lock:
-            # earliest total index we still have
-            latest_total = self.total_written
-            earliest_total = max(0, self.total_written - self.size)
-            # clamp
-            start = max(start_total_idx, earliest_total)
-            end = min(end_total_idx, latest_total)
+            earliest = max(0, self.frames_written - self.frame_capacity)
+            start = max(start_frame, earliest)
+            end = min(end_frame, self.frames_written)
             if end <= start:
-                return np.array([], dtype=np.float32)
+                return np.array([], dtype=np.float64)
             length = end - start
-            # map start to buffer index
-            start_idx = (self.head - (self.total_written - start)) % self.capacity
-            # now read length samples starting at start_idx (may wrap)
-            if start_idx + length <= self.capacity:
-                return self.buf[start_idx : start_idx + length].copy()
+            start_idx = start % self.frame_capacity
+            if start_idx + length <= self.frame_capacity:
+                out = self.frame_energy[start_idx : start_idx + length].copy()
             else:
-                first = self.capacity - start_idx
-                out = np.empty(length, dtype=np.float32)
-                out[:first] = self.buf[start_idx:]
-                out[first:] = self.buf[: length - first]
-                return out
+                first = self.frame_capacity - start_idx
+                out = np.concatenate(
+                    (self.frame_energy[start_idx:], self.frame_energy[: length - first])
+                )
+        if self.spsc:
+            # drop frames the producer may have lapped while we copied
+            lapped = (self._write_end // self.frame_size - self.frame_capacity) - start
+            if lapped > 0:
+                out = out[lapped:]
+        return out
+
+    def get_frame_bounds(self) -> tuple[int, int]:
+        """Return (earliest, latest) frame indices whose samples are still retained."""
+        with self.lock:
+            earliest_total = max(0, self.total_written - self.size)
+            earliest = -(-earliest_total // self.frame_size) if self.frame_size else 0
+            return earliest, self.frames_written
+
+    def wait_for(self, total_idx: int, timeout: Optional[float] = None) -> bool:
+        """Block the consumer until total_written reaches total_idx (or timeout).
+        append only signals once the target is crossed, so the producer pays an
+        Event.set per wakeup instead of a notify per block.
+        """
+        self._wake_at = total_idx
+        if self.total_written >= total_idx:
+            return True
+        self._data_event.clear()
+        # re-check: append may have crossed the target before the clear
+        if self.total_written >= total_idx:
+            return True
+        return self._data_event.wait(timeout)
+
+    def wake(self):
+        """Release a consumer blocked in wait_for (e.g. on stop)."""
+        self._data_event.set()
 
     def get_latest_total_index(self) -> int:
         with self.lock:
@@ -101,6 +286,21 @@ def rms_db(samples: np.ndarray) -> float:
     return 20.0 * math.log10(rms)
 
 
+def energy_db(energy: float, n_samples: int) -> float:
+    """Same scale as rms_db, but from a precomputed sum of squares."""
+    if n_samples <= 0:
+        return -100.0
+    mean = energy / n_samples
+    if mean < 1e-20:
+        return -100.0
+    return 10.0 * math.log10(mean)
+
+
+def db_to_energy(db: float, n_samples: int) -> float:
+    """Inverse of energy_db: sum of squares that n_samples need to reach db."""
+    return (10.0 ** (db / 10.0)) * n_samples
+
+
 def float32_to_int16(x: np.ndarray) -> np.ndarray:
     clipped = np.clip(x, -1.0, 1.0)
     return (clipped * 32767.0).astype(np.int16)
@@ -118,35 +318,78 @@ class Segmenter:
         chunk_duration: float = 0.1,
         pre_roll: float = 0.3,
         output_folder: str = "segments",
+        archiver=None,
+        lockless: bool = False,
+        wakeup_granularity: Optional[float] = None,
+        vad: Optional[VADBackend] = None,
+        source_id: str = "default",
+        sink: Optional[Callable[[AudioSegment], None]] = None,
     ):
+        self.source_id = source_id
+        # where finished segments go (the STT pipeline unless told otherwise)
+        self.sink = sink if sink is not None else state.audio_queue.put
         self.sample_rate = int(sample_rate)
         self.chunk_duration = float(chunk_duration)
         self.chunk_size = int(self.sample_rate * self.chunk_duration)
         self.buffer_capacity = int(buffer_seconds * self.sample_rate)
-        self.buf = CircularBuffer(self.buffer_capacity)
+        # lockless=True: the audio callback is the only writer and the analyzer
+        # the only reader, so the buffer runs in SPSC mode (no lock in callback)
+        self.buf = CircularBuffer(
+            self.buffer_capacity, frame_size=self.chunk_size, spsc=lockless
+        )
         self.cfg = cfg
+        self.vad = vad if vad is not None else EnergyVAD()
         self.pre_roll = pre_roll
+        # minimum new audio that wakes the analyzer (defaults to one chunk)
+        if wakeup_granularity is None:
+            wakeup_granularity = self.chunk_duration
+        self.wakeup_samples = max(1, int(self.sample_rate * wakeup_granularity))
         self.output_folder = output_folder
-        # os.makedirs(self.output_folder, exist_ok=True)
+        self.archiver = archiver  # optional workers.archiver.SegmentArchiver
 
         # analyzer state
         self._analyzer_thread = None
         self._stop_event = threading.Event()
         self.last_saved_until = 0  # total sample index until which we already handled
         self.segment_counter = 0
+        self._scan_frame = 0  # next frame where a speech window may start
+        self._seg_start: Optional[int] = None  # start sample of the open segment
+        self._search_frame = 0  # next frame to check while a segment is open
+        self._last_voice_frame = 0  # frame index just past the last voiced frame
+        self._partial_start = 0  # start sample of the next partial chunk
+        self._partial_end = 0  # end sample of the last partial chunk sent
+        self._speech_start = 0  # where the VAD heard the open segment start
+        # streaming hypotheses: id of the open segment and when the next one is due
+        self._utterance_id = 0
+        self._next_hypothesis = 0
+        self._hypotheses_sent = False
+        # adaptive threshold: running noise-floor estimate (dB) and next frame to fold
+        self.noise_floor_db = cfg.silence_threshold_db - cfg.noise_floor_margin_db
+        self._floor_frame = 0
+        self._seed_levels = []  # levels (dB) of the first noise_floor_seed_seconds
 
     def audio_callback(self, indata: np.ndarray, frames: int, time_info, status):
         """To be used as sounddevice callback (indata is shape (frames, channels))."""
         if status:
             print("[AUDIO] status:", status)
-        # assume mono or take first channel
-        if indata.ndim > 1:
-            mono = indata[:, 0].astype(np.float32)
-        else:
-            mono = indata.astype(np.float32)
+        # assume mono or take first channel (a view: append copies into the ring)
+        mono = indata[:, 0] if indata.ndim > 1 else indata
         # ensure range -1..1; sounddevice typically gives that
         self.buf.append(mono)
 
+    def feed(self, block: np.ndarray):
+        """Append audio and analyze it right away, without the analyzer thread.
+        Used to run files through the Segmenter faster than realtime.
+        """
+        self.audio_callback(block, block.shape[0], None, None)
+        self._process_pending()
+
+    def flush(self):
+        """Close the segment still open at the end of the input (see feed)."""
+        self._process_pending()
+        if self._seg_start is not None:
+            self._close_segment(self._last_voice_frame * self.chunk_size)
+
     def start(self):
         self._stop_event.clear()
         self._analyzer_thread = threading.Thread(target=self._analyze_loop, daemon=True)
@@ -154,117 +397,417 @@ class Segmenter:
 
     def stop(self):
         self._stop_event.set()
+        self.buf.wake()
         if self._analyzer_thread is not None:
             self._analyzer_thread.join(timeout=1.0)
 
     def _analyze_loop(self):
         """Loop que revisa buffer para detectar segmentos y guardarlos."""
-        sr = self.sample_rate
-        chunk = self.chunk_size
-        # we'll examine windows of e.g. voice_time_to_unidle seconds to detect start
-        voice_samples_needed = max(
-            1, int(self.sample_rate * self.cfg.voice_time_to_unidle)
-        )
-        pre_roll_samples = int(self.sample_rate * self.pre_roll)
-        min_silence_samples = int(self.sample_rate * self.cfg.min_silence_to_end)
-        min_segment_samples = int(self.sample_rate * self.cfg.min_segment_duration)
-
-        # scanning pointer: absolute sample index where we last scanned
-        scan_pos = max(0, self.buf.get_latest_total_index() - self.buf.get_size())
-
         while not self._stop_event.is_set():
             with lock:
                 cfg = shared["settings"]
                 self.cfg = cfg
 
-            # print("Really Analyzing")
-            latest = self.buf.get_latest_total_index()
-            earliest = max(0, latest - self.buf.get_size())
+            needed = self._process_pending()
+            # block until the audio the next decision needs has arrived; the
+            # timeout only bounds how stale settings and the stop flag can get
+            self.buf.wait_for(
+                max(needed, self.buf.get_latest_total_index() + self.wakeup_samples),
+                timeout=0.5,
+            )
+
+        print("[ANALYZER] stopped")
 
-            # Asegúrate de no escanear fuera de lo que existe
-            if scan_pos < earliest:
-                scan_pos = earliest
+    def _process_pending(self) -> int:
+        """Scan every complete frame not analyzed yet, in one vectorized pass.
 
-            while scan_pos + voice_samples_needed <= latest:
-                # take window to decide if speech starts here
-                window_start = scan_pos
-                window_end = scan_pos + voice_samples_needed
-                window = self.buf.read_range_by_total_index(window_start, window_end)
-                db = rms_db(window)
+        Decisions use the per-frame energies the CircularBuffer keeps in append,
+        so a voice_time_to_unidle window costs one subtraction on a cumulative
+        sum instead of re-reading and re-squaring its samples.
 
+        Returns the total sample index the next decision needs to be available.
+        """
+        chunk = self.chunk_size
+        # window of voice_time_to_unidle seconds (in frames) to detect start
+        window_frames = max(
+            1, math.ceil(self.sample_rate * self.cfg.voice_time_to_unidle / chunk)
+        )
+        min_silence_samples = int(self.sample_rate * self.cfg.min_silence_to_end)
+        silence_frames = math.ceil(min_silence_samples / chunk)
+        max_samples = int(self.sample_rate * self.cfg.max_segment_duration)
+        partial_samples = (
+            int(self.sample_rate * self.cfg.partial_duration)
+            if self.cfg.stream_partials and not self.cfg.stream_hypotheses
+            else 0
+        )
+        hypotheses = self.cfg.stream_hypotheses
+        # the adaptive noise floor is seeded with this many frames
+        seed_frames = int(self.sample_rate * self.cfg.noise_floor_seed_seconds / chunk)
+
+        earliest, latest = self.buf.get_frame_bounds()
+
+        while True:
+            if self._seg_start is None:
+                # Asegúrate de no escanear fuera de lo que existe
+                if self._scan_frame < earliest:
+                    self._scan_frame = earliest
+                if self._scan_frame + window_frames > latest:
+                    return (self._scan_frame + window_frames) * chunk
+
+                energies = self.buf.read_frame_energies(self._scan_frame, latest)
+                self._scan_frame = latest - energies.shape[0]
+                if energies.shape[0] < window_frames:
+                    return (self._scan_frame + window_frames) * chunk
+                csum = np.concatenate(([0.0], np.cumsum(energies)))
+                windows = csum[window_frames:] - csum[:-window_frames]
+                frame_threshold = self._frame_thresholds(energies.shape[0])
+                tsum = np.concatenate(([0.0], np.cumsum(frame_threshold)))
+                window_threshold = tsum[window_frames:] - tsum[:-window_frames]
+                # a window opens a segment if it is loud enough and the VAD
+                # backend hears speech in enough of its frames
+                speech = self.vad.speech_frames(
+                    self.buf, self._scan_frame, energies, frame_threshold
+                )
+                counts = np.concatenate(([0], np.cumsum(speech)))
+                voiced = counts[window_frames:] - counts[:-window_frames]
+                hits = np.flatnonzero(
+                    (windows > window_threshold)
+                    & (voiced >= self.cfg.vad_min_speech_frames)
+                )
+                i = int(hits[0]) if hits.size else windows.shape[0] - 1
+                # the noise floor only learns from audio before the segment start
+                last = i if hits.size else energies.shape[0]
+                self._update_noise_floor(
+                    self._scan_frame, energies[:last], speech[:last]
+                )
+
+                db = energy_db(float(windows[i]), window_frames * chunk)
                 with lock:
                     shared["current_db"] = db
+                    shared["sources_db"][self.source_id] = db
+
+                if not hits.size:
+                    # no speech here, move the scan past every window checked
+                    self._scan_frame += windows.shape[0]
+                    return (self._scan_frame + window_frames) * chunk
+
+                # speech detected for this window: back off by the pre-roll
+                window_start = self._scan_frame + i
+                self._seg_start = max(
+                    0, window_start * chunk - int(self.sample_rate * self.pre_roll)
+                )
+                # speech range starts at the window's first voiced frame
+                voiced_at = np.flatnonzero(speech[i : i + window_frames])
+                self._speech_start = (
+                    window_start + (int(voiced_at[0]) if voiced_at.size else 0)
+                ) * chunk
+                self._search_frame = window_start + window_frames
+                self._last_voice_frame = self._search_frame
+                self._partial_start = self._seg_start
+                self._partial_end = self._seg_start
+                self._start_utterance()
+
+            # Segment open: look for min_silence_to_end of silence after the last voice
+            if self._search_frame < earliest:
+                self._search_frame = earliest
+            # the segment cannot end before min_silence_to_end after the last voice,
+            # unless it hits max_segment_duration or a partial chunk or a
+            # hypothesis is due first
+            needed = max(
+                self._search_frame + 1, self._last_voice_frame + silence_frames + 1
+            )
+            if max_samples:
+                needed = min(needed, math.ceil((self._seg_start + max_samples) / chunk))
+            if partial_samples:
+                needed = min(
+                    needed, math.ceil((self._partial_start + partial_samples) / chunk)
+                )
+            if hypotheses:
+                needed = min(needed, math.ceil(self._next_hypothesis / chunk))
+            needed = max(needed, self._search_frame + 1)
+            if needed > latest:
+                return needed * chunk
+
+            energies = self.buf.read_frame_energies(self._search_frame, latest)
+            self._search_frame = latest - energies.shape[0]
+            if not energies.shape[0]:
+                return needed * chunk
+            frames = np.arange(
+                self._search_frame, self._search_frame + energies.shape[0]
+            )
+            # frame index just past the last voiced frame, as seen at each frame
+            frame_threshold = self._frame_thresholds(energies.shape[0])
+            speech = self.vad.speech_frames(
+                self.buf, self._search_frame, energies, frame_threshold
+            )
+            if len(self._seed_levels) < seed_frames:
+                # the seed takes speech too; everything else waits for the close
+                self._update_noise_floor(
+                    self._search_frame, energies, np.ones_like(speech)
+                )
+            last_voice = np.maximum.accumulate(
+                np.where(speech, frames + 1, self._last_voice_frame)
+            )
+            ended = np.flatnonzero((frames - last_voice) * chunk >= min_silence_samples)
+            end_at = int(ended[0]) if ended.size else energies.shape[0]
+
+            if max_samples:
+                too_long = np.flatnonzero(
+                    (frames[:end_at] + 1) * chunk - self._seg_start >= max_samples
+                )
+                if too_long.size:
+                    self._split_segment(int(frames[too_long[0]]), max_samples)
+                    continue
+
+            if not ended.size:
+                # not enough silence yet -> wait for more audio
+                self._last_voice_frame = int(last_voice[-1])
+                self._search_frame = int(frames[-1]) + 1
+                self._emit_partials(self._search_frame * chunk)
+                self._emit_hypothesis(self._search_frame * chunk)
+                continue
+
+            seg_end_frame = int(last_voice[end_at])
+            self._close_segment(seg_end_frame * chunk)
+            # advance scan past seg_end + small guard to avoid re-detecting
+            self._scan_frame = seg_end_frame + math.ceil(
+                int(self.sample_rate * 0.05) / chunk
+            )
+
+    def _frame_thresholds(self, n: int) -> np.ndarray:
+        """Speech threshold (as frame energy) for the next n frames.
+
+        Fixed silence_threshold_db unless cfg.adaptive_threshold: then it is the
+        current noise-floor estimate + noise_floor_margin_db (see
+        _update_noise_floor), published in shared for the GUI.
+        """
+        chunk = self.chunk_size
+        if not self.cfg.adaptive_threshold:
+            with lock:
+                shared["noise_floor_db"] = None
+                shared["threshold_db"] = None
+            return np.full(n, db_to_energy(self.cfg.silence_threshold_db, chunk))
+
+        threshold_db = min(
+            max(
+                self.noise_floor_db + self.cfg.noise_floor_margin_db,
+                self.cfg.adaptive_min_threshold_db,
+            ),
+            self.cfg.adaptive_max_threshold_db,
+        )
+        with lock:
+            shared["noise_floor_db"] = self.noise_floor_db
+            shared["threshold_db"] = threshold_db
+        return np.full(n, db_to_energy(threshold_db, chunk))
 
-                if db > self.cfg.silence_threshold_db:
-                    # speech detected for this window: find exact start by backing off a bit
-                    seg_start = max(0, window_start - pre_roll_samples)
-                    # now we need to find segment end: consume until we see min_silence_samples of silence
-                    # we'll read in increasing blocks
-                    search_pos = window_end
-                    last_voice_pos = window_end
-                    while search_pos < latest or (
-                        not self._stop_event.is_set()
-                        and search_pos < self.buf.get_latest_total_index()
-                    ):
-                        # read a block
-                        blk_end = min(
-                            search_pos + chunk, self.buf.get_latest_total_index()
-                        )
-                        blk = self.buf.read_range_by_total_index(search_pos, blk_end)
-                        if blk.size == 0:
-                            # no data yet; break to outer loop to wait for more
-                            break
-                        blk_db = rms_db(blk)
-                        if blk_db > self.cfg.silence_threshold_db:
-                            last_voice_pos = blk_end
-                        # if we have been silent for min_silence_samples after last_voice_pos, we end
-                        if (search_pos - last_voice_pos) >= min_silence_samples:
-                            seg_end = last_voice_pos  # end just after last voice
-                            # clamp by min_segment
-                            if seg_end - seg_start >= min_segment_samples:
-                                # ensure we don't save overlapping/duplicate segments
-                                if seg_end > self.last_saved_until:
-                                    samples = self.buf.read_range_by_total_index(
-                                        seg_start, seg_end
-                                    )
-                                    # Save to WAV (blocking but fast). We do it here synchronously.
-                                    # timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                                    # filename = f"seg_{timestamp}_{self.segment_counter:04d}.wav"
-                                    # path = os.path.join(self.output_folder, filename)
-                                    # int16 = float32_to_int16(samples)
-                                    # wavfile.write(path, sr, int16)
-
-                                    state.audio_queue.put(samples)
-
-                                    print(
-                                        f"[SEGMENT] Saved {self.segment_counter} ({len(samples) / sr:.2f}s)"
-                                    )
-                                    self.segment_counter += 1
-                                    self.last_saved_until = seg_end
-                                else:
-                                    # overlapping or already saved
-                                    pass
-                            else:
-                                # too short, ignore
-                                pass
-                            # advance scan_pos past seg_end + small guard to avoid re-detecting
-                            scan_pos = seg_end + int(self.sample_rate * 0.05)
-                            break
-                        # advance search_pos
-                        search_pos = blk_end
-                        latest = self.buf.get_latest_total_index()
-                    else:
-                        # while ended normally, but maybe not enough data yet -> break outer and wait
-                        break
-                # no speech here, move scan_pos forward by chunk
-                scan_pos += chunk
-            # sleep briefly to avoid busy-waiting
-            time.sleep(0.02)
+    def _update_noise_floor(
+        self, first_frame: int, energies: np.ndarray, speech: np.ndarray
+    ):
+        """Fold frames not seen before into the running noise-floor estimate.
 
-        print("[ANALYZER] stopped")
+        The first noise_floor_seed_seconds of audio seed it directly with their
+        noise_floor_percentile level, speech or not. After that only frames the
+        VAD didn't take for speech move it, one stochastic quantile step each,
+        and the analyzer doesn't call this while a segment is open.
+        """
+        if not self.cfg.adaptive_threshold:
+            return
+        n = energies.shape[0]
+        new = max(0, min(n, self._floor_frame - first_frame))
+        self._floor_frame = max(self._floor_frame, first_frame + n)
+        if new >= n:
+            return
+        levels = 10.0 * np.log10(np.maximum(energies[new:] / self.chunk_size, 1e-10))
+        p = self.cfg.noise_floor_percentile
 
+        seed_frames = int(
+            self.sample_rate * self.cfg.noise_floor_seed_seconds / self.chunk_size
+        )
+        speech = speech[new:]
+        seeding = max(0, seed_frames - len(self._seed_levels))
+        if seeding:
+            self._seed_levels.extend(levels[:seeding])
+            self.noise_floor_db = float(np.percentile(self._seed_levels, 100 * p))
+            levels = levels[seeding:]
+            speech = speech[seeding:]
+
+        step = self.cfg.noise_floor_step_db
+        q = self.noise_floor_db
+        for level in levels[~speech]:
+            # stochastic quantile step: up by step*p, down by step*(1-p)
+            q += step * p if level > q else -step * (1.0 - p)
+        self.noise_floor_db = q
+
+    def _split_segment(self, limit_frame: int, max_samples: int):
+        """Force-split an open segment that reached max_segment_duration.
+
+        The cut goes through the quietest frame of the last split_lookback
+        seconds (never before min_segment_duration) and the remainder stays
+        open as a new segment that starts at the cut, without pre-roll.
+        """
+        chunk = self.chunk_size
+        lookback = max(1, int(self.sample_rate * self.cfg.split_lookback / chunk))
+        min_end = self._seg_start + int(
+            self.sample_rate * self.cfg.min_segment_duration
+        )
+        first = max(limit_frame + 1 - lookback, math.ceil(min_end / chunk))
+        first = min(first, limit_frame)
+        energies = self.buf.read_frame_energies(first, limit_frame + 1)
+        quiet = limit_frame + 1 - energies.shape[0] + int(np.argmin(energies))
+        cut = min(quiet * chunk + chunk // 2, self._seg_start + max_samples)
+
+        self._close_segment(cut)
+        self._seg_start = cut
+        self._speech_start = cut
+        # partials may already cover audio past the cut; don't send it twice
+        self._partial_start = max(cut, self._partial_start)
+        self._search_frame = quiet + 1
+        self._last_voice_frame = quiet + 1
+        self._start_utterance()
+
+    def _start_utterance(self):
+        """A new segment is open: new utterance id, first hypothesis due now."""
+        self._utterance_id += 1
+        self._next_hypothesis = self._seg_start
+        self._hypotheses_sent = False
+
+    def _emit_hypothesis(self, available_until: int):
+        """Send everything the open segment has so far as a "partial" segment,
+        at most once per hypothesis_interval (stream_hypotheses). The STT
+        re-decodes the growing window; the final segment replaces it.
+        """
+        if not self.cfg.stream_hypotheses or available_until < self._next_hypothesis:
+            return
+        samples = self.buf.read_range_by_total_index(self._seg_start, available_until)
+        self.sink(
+            AudioSegment(
+                samples=samples,
+                source_id=self.source_id,
+                sample_rate=self.sample_rate,
+                start_index=available_until - len(samples),
+                speech_start=self._speech_offset(available_until - len(samples)),
+                kind="partial",
+                utterance_id=self._utterance_id,
+            )
+        )
+        self._hypotheses_sent = True
+        self._next_hypothesis = available_until + max(
+            1, int(self.sample_rate * self.cfg.hypothesis_interval)
+        )
 
-def run_listener():
+    def _emit_partials(self, available_until: int):
+        """Stream partial_duration chunks of the open segment (stream_partials)."""
+        if not self.cfg.stream_partials or self.cfg.stream_hypotheses:
+            return
+        size = int(self.sample_rate * self.cfg.partial_duration)
+        step = size - int(self.sample_rate * self.cfg.partial_overlap)
+        while size > 0 and self._partial_start + size <= available_until:
+            end = self._partial_start + size
+            self._emit_segment(
+                self._partial_start, end, overlap=self._partial_overlap()
+            )
+            self._partial_start += max(1, step)
+            self._partial_end = end
+
+    def _partial_overlap(self) -> int:
+        """Samples the next chunk repeats from the previous one; the STT drops
+        the words they produce twice.
+        """
+        return max(0, self._partial_end - self._partial_start)
+
+    def _close_segment(self, seg_end: int):
+        """Emit the segment ending at seg_end (only its tail if partials went out)."""
+        self._emit_partials(seg_end)
+        if self._partial_start == self._seg_start:
+            emitted = self._emit_segment(self._seg_start, seg_end)
+            if not emitted and self._hypotheses_sent:
+                # dropped, but its partials went out: an empty final clears them
+                self.sink(
+                    AudioSegment(
+                        samples=np.zeros(0, dtype=np.float32),
+                        source_id=self.source_id,
+                        sample_rate=self.sample_rate,
+                        start_index=seg_end,
+                        utterance_id=self._utterance_id,
+                    )
+                )
+        elif seg_end - self._partial_start > int(
+            self.sample_rate * self.cfg.partial_overlap
+        ):
+            # the rest after the last partial, with the usual overlap
+            self._emit_segment(
+                self._partial_start,
+                seg_end,
+                min_duration=0.0,
+                overlap=self._partial_overlap(),
+            )
+        self._seg_start = None
+
+    def _speech_offset(self, start_index: int) -> int:
+        """Pre-roll of a segment starting at start_index: samples before the
+        point where the VAD heard speech. Segments end at the last voiced
+        frame, so the speech range runs to their end.
+        """
+        return max(0, self._speech_start - start_index)
+
+    def _emit_segment(
+        self,
+        seg_start: int,
+        seg_end: int,
+        min_duration: Optional[float] = None,
+        overlap: int = 0,
+    ) -> bool:
+        sr = self.sample_rate
+        if min_duration is None:
+            min_duration = self.cfg.min_segment_duration
+        if seg_end - seg_start < int(sr * min_duration):
+            # too short, ignore
+            return False
+        if seg_end <= self.last_saved_until:
+            # overlapping or already saved
+            return False
+
+        samples = self.buf.read_range_by_total_index(seg_start, seg_end)
+        segment = AudioSegment(
+            samples=samples,
+            source_id=self.source_id,
+            sample_rate=sr,
+            start_index=seg_end - len(samples),
+            utterance_id=self._utterance_id,
+            speech_start=self._speech_offset(seg_end - len(samples)),
+            overlap=max(0, overlap - (seg_end - seg_start - len(samples))),
+        )
+        self.sink(segment)
+        # the archiver only queues it; disk writes happen in its own thread
+        if self.archiver is not None:
+            self.archiver.submit(segment)
+
+        print(
+            f"[SEGMENT] {self.source_id}: saved {self.segment_counter} "
+            f"({len(samples) / sr:.2f}s)"
+        )
+        self.segment_counter += 1
+        self.last_saved_until = seg_end
+        return True
+
+
+def _make_callback(channels: dict[int, Segmenter]):
+    """sounddevice callback that feeds each channel to its own Segmenter."""
+
+    def callback(indata, frames, t, status):
+        for ch, seg in channels.items():
+            seg.audio_callback(indata[:, ch], frames, t, status)
+
+    return callback
+
+
+def run_listener(sources: Optional[list[dict]] = None):
+    """Capture every configured source, one CircularBuffer + Segmenter each.
+
+    sources: [{"type": ..., "channel": int, "id": str, ...}, ...] (defaults to
+    state.listener_sources); entries of the same input (same device, port or
+    file) are channels of one AudioSource. See workers.sources.create_source.
+    """
     sr = 16000
     s_cfg = SegmenterSettings()
     s_cfg.silence_threshold_db = -42.0
@@ -272,36 +815,65 @@ def run_listener():
     s_cfg.min_segment_duration = 0.85
     s_cfg.min_silence_to_end = 0.35
 
-    seg = Segmenter(
-        sample_rate=sr,
-        buffer_seconds=40,
-        chunk_duration=0.05,
-        cfg=s_cfg,
-        pre_roll=0.2,
-        output_folder="segments",
-    )
-
-    # start analyzer
-    seg.start()
-
-    # start audio stream
-    stream = sd.InputStream(
-        samplerate=sr,
-        channels=1,
-        dtype="float32",
-        blocksize=int(sr * 0.02),  # 20 ms blocks
-        callback=lambda indata, frames, t, status: seg.audio_callback(
-            indata[:, 0] if indata.ndim > 1 else indata, frames, t, status
-        ),
-    )
-    with stream:
-        print("[MAIN] Listening... press Ctrl+C to stop")
-        try:
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            print("Stopping...")
-    seg.stop()
+    if sources is None:
+        sources = state.listener_sources
+
+    archiver = None
+    if ArchiverSettings.enabled:
+        from workers.archiver import SegmentArchiver
+
+        archiver = SegmentArchiver(ArchiverSettings())
+        archiver.start()
+
+    # input key -> (first spec, {channel: Segmenter})
+    inputs: dict = {}
+    segmenters = []
+    for src in sources:
+        seg = Segmenter(
+            sample_rate=sr,
+            buffer_seconds=40,
+            chunk_duration=0.05,
+            cfg=s_cfg,
+            pre_roll=0.2,
+            output_folder=ArchiverSettings.folder,
+            archiver=archiver,
+            lockless=True,
+            vad=create_vad(s_cfg),
+            source_id=src.get("id", "default"),
+        )
+        _, channels = inputs.setdefault(source_key(src), (src, {}))
+        channels[int(src.get("channel", 0))] = seg
+        segmenters.append(seg)
+
+    # start analyzers
+    for seg in segmenters:
+        seg.start()
+
+    # start audio sources, each in its own thread
+    stop_event = threading.Event()
+    threads = []
+    for spec, channels in inputs.values():
+        source = create_source(spec, max(channels) + 1, sample_rate=sr)
+        t = threading.Thread(
+            target=source.run,
+            args=(_make_callback(channels), stop_event),
+            daemon=True,
+        )
+        t.start()
+        threads.append(t)
+
+    timing.mark("listener started")
+    print(f"[MAIN] Listening on {len(segmenters)} source(s)... press Ctrl+C to stop")
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Stopping...")
+    stop_event.set()
+    for seg in segmenters:
+        seg.stop()
+    if archiver is not None:
+        archiver.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,253 @@
+import socket
+import sys
+import threading
+import time
+from typing import Callable
+
+import numpy as np
+
+# callback(indata, frames, time_info, status), igual que sounddevice;
+# indata es float32 con forma (frames, channels)
+AudioCallback = Callable[[np.ndarray, int, object, object], None]
+
+
+# ---------------------------
+# Fuentes de audio del listener
+# ---------------------------
+class AudioSource:
+    """Produces float32 blocks shaped (frames, channels) for a callback.
+
+    run blocks until the source is exhausted or stop_event is set, so the
+    listener runs each source in its own thread.
+    """
+
+    def __init__(self, sample_rate: int = 16000, channels: int = 1):
+        self.sample_rate = int(sample_rate)
+        self.channels = int(channels)
+
+    def run(self, callback: AudioCallback, stop_event: threading.Event):
+        raise NotImplementedError
+
+
+class DeviceSource(AudioSource):
+    """Sound card input through sounddevice (PortAudio)."""
+
+    def __init__(self, device=None, sample_rate=16000, channels=1, block=0.02):
+        super().__init__(sample_rate, channels)
+        self.device = device
+        self.block = block
+
+    def run(self, callback, stop_event):
+        import sounddevice as sd
+
+        stream = sd.InputStream(
+            device=self.device,
+            samplerate=self.sample_rate,
+            channels=self.channels,
+            dtype="float32",
+            blocksize=int(self.sample_rate * self.block),
+            callback=callback,
+        )
+        with stream:
+            stop_event.wait()
+
+
+class RawPCMSource(AudioSource):
+    """Interleaved raw PCM (int16 or float32) read from a binary stream in
+    large blocks. Subclasses pass their read function to _read_stream.
+    """
+
+    def __init__(self, sample_rate=16000, channels=1, dtype="int16", block=0.5):
+        super().__init__(sample_rate, channels)
+        self.dtype = np.dtype(dtype)
+        self.block_bytes = (
+            max(1, int(sample_rate * block)) * self.channels * self.dtype.itemsize
+        )
+
+    def _read_stream(self, read: Callable[[int], bytes], callback, stop_event):
+        frame_bytes = self.channels * self.dtype.itemsize
+        pending = b""
+        while not stop_event.is_set():
+            data = read(self.block_bytes)
+            if not data:
+                return
+            pending += data
+            usable = len(pending) - len(pending) % frame_bytes
+            if not usable:
+                continue
+            block = np.frombuffer(pending[:usable], dtype=self.dtype)
+            pending = pending[usable:]
+            callback(self._to_float(block), usable // frame_bytes, None, None)
+
+    def _to_float(self, block: np.ndarray) -> np.ndarray:
+        if self.dtype == np.int16:
+            block = block.astype(np.float32) / 32768.0
+        else:
+            block = block.astype(np.float32, copy=False)
+        return block.reshape(-1, self.channels)
+
+
+class StdinSource(RawPCMSource):
+    """Raw PCM on stdin, e.g. `ffmpeg -i ... -f s16le -ac 1 -ar 16000 - | ...`."""
+
+    def run(self, callback, stop_event):
+        self._read_stream(sys.stdin.buffer.read, callback, stop_event)
+
+
+class TcpSource(RawPCMSource):
+    """Listens on host:port and reads raw PCM from one connection at a time
+    (e.g. `ffmpeg ... -f s16le tcp://host:port`). When a sender disconnects,
+    the next connection continues the same stream.
+    """
+
+    def __init__(self, host="0.0.0.0", port=9000, **kwargs):
+        super().__init__(**kwargs)
+        self.host = host
+        self.port = int(port)
+
+    def run(self, callback, stop_event):
+        with socket.create_server((self.host, self.port)) as srv:
+            srv.settimeout(0.5)
+            print(f"[SOURCE] Waiting for PCM on tcp://{self.host}:{self.port}")
+            while not stop_event.is_set():
+                try:
+                    conn, addr = srv.accept()
+                except socket.timeout:
+                    continue
+                print(f"[SOURCE] PCM sender connected: {addr}")
+                with conn:
+                    self._read_stream(self._recv(conn), callback, stop_event)
+                print(f"[SOURCE] PCM sender left: {addr}")
+
+    @staticmethod
+    def _recv(conn: socket.socket) -> Callable[[int], bytes]:
+        def read(n: int) -> bytes:
+            # recv may return less than n; gather until n or EOF
+            chunks = []
+            while n > 0:
+                data = conn.recv(n)
+                if not data:
+                    break
+                chunks.append(data)
+                n -= len(data)
+            return b"".join(chunks)
+
+        return read
+
+
+class FileSource(AudioSource):
+    """WAV/FLAC (anything PyAV decodes), resampled to sample_rate float32.
+
+    With realtime=True blocks are paced to the wall clock, like a live input;
+    otherwise the file is read as fast as it decodes. downmix=True averages
+    all the file's channels into one instead of picking them.
+    """
+
+    def __init__(
+        self,
+        path,
+        sample_rate=16000,
+        channels=1,
+        block=0.5,
+        realtime=True,
+        downmix=False,
+    ):
+        super().__init__(sample_rate, 1 if downmix else channels)
+        self.path = path
+        self.block_frames = max(1, int(sample_rate * block))
+        self.realtime = realtime
+        self.downmix = downmix
+
+    def run(self, callback, stop_event):
+        started = time.monotonic()
+        sent = 0
+        for block in self.blocks():
+            if stop_event.is_set():
+                return
+            if self.realtime:
+                ahead = sent / self.sample_rate - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+            callback(block, block.shape[0], None, None)
+            sent += block.shape[0]
+
+    def blocks(self):
+        """Yield (frames, channels) float32 blocks of block_frames samples.
+
+        Unless downmix is set, channels are the file's own, in order: channel
+        i of the source is channel i of the file.
+        """
+        import av
+
+        pending = np.zeros((0, self.channels), dtype=np.float32)
+        with av.open(self.path, metadata_errors="ignore") as container:
+            stream = container.streams.audio[0]
+            if stream.channels < self.channels:
+                raise ValueError(
+                    f"{self.path} has {stream.channels} channel(s), "
+                    f"channel {self.channels - 1} requested"
+                )
+            resampler = av.AudioResampler(
+                format="flt", layout=stream.layout, rate=self.sample_rate
+            )
+            for frame in container.decode(stream):
+                for out in resampler.resample(frame):
+                    pending = self._extend(pending, out, stream.channels)
+                while pending.shape[0] >= self.block_frames:
+                    yield pending[: self.block_frames]
+                    pending = pending[self.block_frames :]
+            for out in resampler.resample(None):
+                pending = self._extend(pending, out, stream.channels)
+        if pending.shape[0]:
+            yield pending
+
+    def _extend(self, pending: np.ndarray, frame, channels: int) -> np.ndarray:
+        # "flt" is packed (interleaved): one plane of frames * channels values
+        data = frame.to_ndarray().reshape(-1, channels)
+        if self.downmix:
+            data = data.mean(axis=1, keepdims=True)
+        else:
+            data = data[:, : self.channels]
+        return np.concatenate((pending, data))
+
+
+def source_key(spec: dict) -> tuple:
+    """Entries with the same key are channels of one input (one AudioSource)."""
+    kind = spec.get("type", "device")
+    if kind == "device":
+        return (kind, spec.get("device"))
+    if kind == "tcp":
+        return (kind, spec.get("host", "0.0.0.0"), spec.get("port", 9000))
+    if kind == "file":
+        return (kind, spec["path"])
+    return (kind,)
+
+
+def create_source(spec: dict, channels: int, sample_rate: int = 16000) -> AudioSource:
+    """Build the source described by a state.listener_sources entry.
+
+    type: "device" (default, sounddevice), "stdin", "tcp" or "file"; raw PCM
+    inputs also take dtype ("int16"/"float32"), channels and block seconds.
+    """
+    kind = spec.get("type", "device")
+    if kind == "device":
+        return DeviceSource(spec.get("device"), sample_rate, channels)
+    raw = {
+        "sample_rate": sample_rate,
+        "channels": spec.get("channels", channels),
+        "dtype": spec.get("dtype", "int16"),
+        "block": spec.get("block", 0.5),
+    }
+    if kind == "stdin":
+        return StdinSource(**raw)
+    if kind == "tcp":
+        return TcpSource(spec.get("host", "0.0.0.0"), spec.get("port", 9000), **raw)
+    if kind == "file":
+        return FileSource(
+            spec["path"],
+            sample_rate,
+            channels,
+            block=spec.get("block", 0.5),
+            realtime=spec.get("realtime", True),
+        )
+    raise ValueError(f"Unknown audio source type: {kind}")
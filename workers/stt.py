@@ -1,8 +1,30 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
 import numpy as np
 
 import state
+from models.audio_segment import AudioSegment
+from models.caption import Caption
+from models.stt_settings import STTSettings
+from utils import timing
 
 _whisper = None
+_whisper_key = None  # (model, compute_type) de _whisper
+_cache = None
+_next_model = None  # (key, model) cargado en segundo plano, listo para el cambio
+_next_lock = threading.Lock()
+# streaming: (source_id, utterance_id) -> (última hipótesis, prefijo ya confirmado)
+_hypotheses: dict[tuple[str, int], tuple[list[str], list[str]]] = {}
+# stream_partials: source_id -> palabras del último trozo (para quitar el solape)
+_chunk_words: dict[str, list[str]] = {}
+
+# millones de parámetros y bytes por parámetro, para estimar la memoria de un modelo
+_MODEL_PARAMS_M = {"tiny": 39, "base": 74, "small": 244, "medium": 769, "large": 1550}
+_COMPUTE_BYTES = {"int8": 1, "int8_float16": 1, "float16": 2, "float32": 4}
 
 
 def prepare_for_whisper(samples: np.ndarray, sample_rate: int) -> np.ndarray:
@@ -26,25 +48,358 @@ def prepare_for_whisper(samples: np.ndarray, sample_rate: int) -> np.ndarray:
     return x
 
 
-def init_worker():
+def speech_clip(segment: AudioSegment, n_samples: int) -> tuple[int, int]:
+    """Sample range of a segment worth decoding: the listener's speech range
+    plus clip_padding, or all of it when trust_listener_vad is off.
+    """
+    if not STTSettings.trust_listener_vad:
+        return 0, n_samples
+    pad = int(segment.sample_rate * STTSettings.clip_padding)
+    end = n_samples if segment.speech_end is None else segment.speech_end + pad
+    return max(0, segment.speech_start - pad), min(n_samples, end)
+
+
+def transcribe_batch(model, segments: list[AudioSegment], batch_size: int = 8):
+    """Transcribe several segments in batched passes of faster-whisper's
+    BatchedInferencePipeline. Segments are laid end to end and passed as clip
+    timestamps, so each one is decoded as its own chunk; returns one text per
+    segment, in order.
+    """
+    from faster_whisper import BatchedInferencePipeline
+
+    sr = 16000
+    texts = [[] for _ in segments]
+    audios = []
+    clips = []
+    owners = []  # segment index of each clip (empty segments get none)
+    pos = 0
+    for i, s in enumerate(segments):
+        a = prepare_for_whisper(s.samples, s.sample_rate)
+        if not a.shape[0]:
+            continue
+        audios.append(a)
+        # the pipeline runs no VAD of its own when given clip timestamps
+        lo, hi = speech_clip(s, a.shape[0])
+        clips.append({"start": (pos + lo) / sr, "end": (pos + hi) / sr})
+        owners.append(i)
+        pos += a.shape[0]
+    if not audios:
+        return ["" for _ in segments]
+
+    pipeline = BatchedInferencePipeline(model)
+    results, _ = pipeline.transcribe(
+        np.concatenate(audios),
+        language="en",
+        beam_size=1,
+        clip_timestamps=clips,
+        batch_size=batch_size,
+    )
+
+    # every result of a chunk carries seek = chunk offset in 10 ms frames,
+    # computed the way the pipeline does it
+    fps = model.frames_per_second
+    by_seek = {int(int(c["start"] * sr) / sr * fps): i for c, i in zip(clips, owners)}
+    for r in results:
+        texts[by_seek[r.seek]].append(r.text)
+    return [" ".join(t).strip() for t in texts]
+
+
+def estimate_model_mb(model: str, compute_type: str) -> float:
+    """Rough resident size of a Whisper model, used for the cache budget."""
+    size = model.split("/")[-1].split(".")[0].split("-")[0]
+    params = _MODEL_PARAMS_M.get(size, _MODEL_PARAMS_M["large"])
+    return params * _COMPUTE_BYTES.get(compute_type, 4)
+
+
+class ModelCache:
+    """LRU of loaded WhisperModels keyed by (model, compute_type).
+
+    get loads on a miss and then drops least recently used models until the
+    estimated total fits budget_mb; the key passed as keep (the model in use)
+    and the one just loaded are never dropped.
+    """
+
+    def __init__(self, budget_mb: float):
+        self.budget_mb = budget_mb
+        self._models = OrderedDict()  # key -> (model, mb)
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, str], keep: Optional[tuple[str, str]] = None):
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+
+        print(f"[STT] Loading {key[0]} ({key[1]})...")
+        model = load_model(*key)
+
+        with self._lock:
+            self._models[key] = (model, estimate_model_mb(*key))
+            total = sum(mb for _, mb in self._models.values())
+            for old in list(self._models):
+                if total <= self.budget_mb:
+                    break
+                if old in (key, keep):
+                    continue
+                total -= self._models.pop(old)[1]
+                print(f"[STT] Dropped {old[0]} ({old[1]}) from the model cache")
+        return model
+
+
+def load_model(model: str, compute_type: str, cpu_threads: int = 0):
+    """Load a WhisperModel from the local cache, downloading only if missing,
+    and run one warm-up decode.
+    """
     from faster_whisper import WhisperModel
 
-    global _whisper
+    kwargs = {"device": "cpu", "compute_type": compute_type, "cpu_threads": cpu_threads}
+    try:
+        # already on disk: no round trip to the Hugging Face Hub
+        whisper = WhisperModel(model, local_files_only=True, **kwargs)
+    except Exception:
+        print(f"[STT] {model} not cached locally, downloading...")
+        whisper = WhisperModel(model, local_files_only=False, **kwargs)
+    timing.mark("Whisper loaded")
+    warm_up(whisper)
+    return whisper
 
-    print("[STT] Starting Whisper...")
 
-    _whisper = WhisperModel(
-        "small.en",
-        device="cpu",
-        compute_type="int8",
-        local_files_only=False,
+def warm_up(model):
+    """One short decode, so the first real segment doesn't pay for lazy setup."""
+    segments, _ = model.transcribe(
+        np.zeros(16000, dtype=np.float32), language="en", beam_size=1
     )
+    for _ in segments:  # transcribe is lazy
+        pass
+
+
+def init_worker():
+    global _whisper, _whisper_key, _cache
+
+    print("[STT] Starting Whisper...")
+
+    _cache = ModelCache(STTSettings.model_cache_mb)
+    _whisper_key = (STTSettings.model, STTSettings.compute_type)
+    _whisper = _cache.get(_whisper_key)
+    timing.mark("Whisper ready")
+    mark_pipeline_ready()
+
+    threading.Thread(target=_model_loader, daemon=True).start()
+
+
+def mark_pipeline_ready():
+    """Whisper is up: segments queued while it loaded get processed instead of
+    expiring, and so do their captions in the queues after the STT (they keep
+    the segment's captured_at).
+    """
+    for q in (state.audio_queue, state.transcripted_text, state.translated_text):
+        q.mark_ready()
+
+
+def _model_loader():
+    """Load models requested from the GUI while the current one keeps serving."""
+    global _next_model
+
+    while True:
+        key = state.stt_model_requests.get()
+        # solo importa el último pedido
+        while True:
+            try:
+                key = state.stt_model_requests.get_nowait()
+            except queue.Empty:
+                break
+        with _next_lock:
+            if key == _whisper_key and _next_model is None:
+                continue
+        try:
+            model = _cache.get(key, keep=_whisper_key)
+        except Exception as e:
+            print(f"[STT] Could not load {key[0]} ({key[1]}): {e}")
+            continue
+        with _next_lock:
+            _next_model = (key, model)
+
+
+def _swap_model():
+    """Switch to the model the loader left ready, if any (between segments)."""
+    global _whisper, _whisper_key, _next_model
+
+    with _next_lock:
+        if _next_model is None:
+            return
+        (_whisper_key, _whisper), _next_model = _next_model, None
+    STTSettings.model, STTSettings.compute_type = _whisper_key
+    print(f"[STT] Now using {_whisper_key[0]} ({_whisper_key[1]})")
+
+
+def transcribe_segment(model, segment: AudioSegment) -> str:
+    if not len(segment.samples):
+        return ""
+    audio = prepare_for_whisper(segment.samples, segment.sample_rate)
+
+    if STTSettings.trust_listener_vad:
+        # the Segmenter already found the speech: decode that range, no second VAD
+        lo, hi = speech_clip(segment, audio.shape[0])
+        sr = segment.sample_rate
+        segments, _ = model.transcribe(
+            audio,
+            language="en",
+            beam_size=1,
+            vad_filter=False,
+            clip_timestamps=[lo / sr, hi / sr],
+        )
+    else:
+        segments, _ = model.transcribe(
+            audio, language="en", beam_size=1, vad_filter=True
+        )
+
+    return " ".join(s.text for s in segments).strip()
+
+
+def collect_batch(max_size: int, wait_ms: float) -> list[AudioSegment]:
+    """Block for one segment, then take whatever else is already queued (up to
+    max_size). Only when a backlog exists does it wait up to wait_ms for the
+    batch to fill, so an idle pipeline keeps single-segment latency.
+    """
+    batch = [state.audio_queue.get()]
+    while len(batch) < max_size:
+        try:
+            batch.append(state.audio_queue.get_nowait())
+        except queue.Empty:
+            break
+    if 1 < len(batch) < max_size:
+        deadline = time.monotonic() + wait_ms / 1000.0
+        while len(batch) < max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(state.audio_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+    return batch
+
+
+def drop_superseded(items: list) -> list:
+    """Drop "partial" items followed by a later one of the same utterance
+    (AudioSegments or Captions): only the newest hypothesis is worth work.
+    """
+    last = {(x.source_id, x.utterance_id): i for i, x in enumerate(items)}
+    return [
+        x
+        for i, x in enumerate(items)
+        if x.kind != "partial" or last[(x.source_id, x.utterance_id)] == i
+    ]
+
+
+def stable_prefix(key: tuple[str, int], text: str) -> Optional[str]:
+    """LocalAgreement over consecutive hypotheses of one utterance: the words
+    two passes in a row agree on are committed and never taken back. Returns
+    the committed text when it grew, None otherwise.
+    """
+    words = text.split()
+    previous, committed = _hypotheses.get(key, ([], []))
+    agreed = 0
+    for a, b in zip(previous, words):
+        if a != b:
+            break
+        agreed += 1
+    grew = agreed > len(committed)
+    if grew:
+        committed = words[:agreed]
+    _hypotheses[key] = (words, committed)
+    return " ".join(committed) if grew else None
+
+
+def _word_key(word: str) -> str:
+    return word.strip(".,;:!?¡¿\"'()").lower()
+
+
+def trim_overlap(previous: list[str], text: str) -> str:
+    """Drop the leading words of an overlapping chunk that repeat the end of
+    the previous chunk (the longest match wins).
+    """
+    words = text.split()
+    tail = [_word_key(w) for w in previous]
+    head = [_word_key(w) for w in words]
+    for k in range(min(len(tail), len(head)), 0, -1):
+        if tail[-k:] == head[:k]:
+            return " ".join(words[k:])
+    return text
+
+
+def _close_stale(segment: AudioSegment):
+    """A source's utterances arrive in order: hypotheses still open for an
+    older one lost their final (shed or expired), so close them empty.
+    """
+    stale = [
+        key
+        for key in _hypotheses
+        if key[0] == segment.source_id and key[1] < segment.utterance_id
+    ]
+    for source_id, utterance_id in stale:
+        del _hypotheses[(source_id, utterance_id)]
+        state.transcripted_text.put(
+            Caption(
+                text="",
+                source_id=source_id,
+                utterance_id=utterance_id,
+                captured_at=segment.captured_at,
+            )
+        )
+
+
+def emit_transcript(segment: AudioSegment, text: str):
+    key = (segment.source_id, segment.utterance_id)
+    _close_stale(segment)
+    if segment.kind == "partial":
+        stable = stable_prefix(key, text)
+        if stable:
+            state.transcripted_text.put(
+                Caption(
+                    text=stable,
+                    source_id=segment.source_id,
+                    kind="partial",
+                    utterance_id=segment.utterance_id,
+                    captured_at=segment.captured_at,
+                )
+            )
+        return
+
+    # consecutive stream_partials chunks share overlap audio: say it once
+    previous = _chunk_words.get(segment.source_id, [])
+    _chunk_words[segment.source_id] = text.split()
+    if segment.overlap:
+        text = trim_overlap(previous, text)
+
+    # the final replaces the partials; sent even empty if partials went out
+    had_partials = _hypotheses.pop(key, None) is not None
+    if text:
+        timing.mark("first transcript")
+        print(f"[STT] Result ({segment.source_id}): {text}")
+    else:
+        print("[STT] Empty result.")
+    if text or had_partials:
+        state.transcripted_text.put(
+            Caption(
+                text=text,
+                source_id=segment.source_id,
+                utterance_id=segment.utterance_id,
+                captured_at=segment.captured_at,
+            )
+        )
 
 
 def run_stt():
     print("[STT] Waiting for GUI...")
     # state.gui_ready_event.wait()
 
+    if STTSettings.workers > 1:
+        from workers.stt_pool import run_stt_pool
+
+        run_stt_pool()
+        return
+
     init_worker()
 
     if _whisper is None:
@@ -55,21 +410,20 @@ def run_stt():
     print("[STT] Whisper Ready.")
 
     while True:
-        audio_path = state.audio_queue.get()
+        batch = drop_superseded(
+            collect_batch(STTSettings.batch_size, STTSettings.batch_wait_ms)
+        )
+        _swap_model()
         try:
-            audio = prepare_for_whisper(audio_path, 2)
-
-            segments, _ = _whisper.transcribe(
-                audio, language="en", beam_size=1, vad_filter=True
-            )
-
-            text = " ".join(s.text for s in segments).strip()
-
-            if text:
-                print(f"[STT] Result: {text}")
-                state.transcripted_text.put(text)
+            if len(batch) == 1:
+                texts = [transcribe_segment(_whisper, batch[0])]
             else:
-                print("[STT] Empty result.")
-
+                texts = transcribe_batch(_whisper, batch, STTSettings.batch_size)
         except Exception as e:
-            print(f"[STT] Error processing {audio_path}: {e}")
+            sources = ", ".join(sorted({s.source_id for s in batch}))
+            print(f"[STT] Error processing {len(batch)} segment(s) from {sources}: {e}")
+            continue
+
+        # in queue order, so captions keep the order segments were cut in
+        for segment, text in zip(batch, texts):
+            emit_transcript(segment, text)
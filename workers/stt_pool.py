@@ -0,0 +1,278 @@
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import state
+from models.audio_segment import AudioSegment
+from models.stt_settings import STTSettings
+from utils import timing
+from workers.stt import (
+    collect_batch,
+    drop_superseded,
+    emit_transcript,
+    load_model,
+    mark_pipeline_ready,
+    transcribe_segment,
+)
+
+
+def _pool_worker(
+    worker_id, model_size, compute_type, cpu_threads, jobs, results, ready
+):
+    """Worker process: one WhisperModel, segments read from shared memory."""
+    model = load_model(model_size, compute_type, cpu_threads)
+    print(f"[STT-POOL] Worker {worker_id} ready ({cpu_threads} threads)")
+    ready.set()
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        seq, shm_name, n, sample_rate, speech_start, speech_end = job
+        try:
+            shm = shared_memory.SharedMemory(name=shm_name)
+            try:
+                view = np.ndarray((n,), dtype=np.float32, buffer=shm.buf)
+                # transcribe works on its own float32 copy (prepare_for_whisper)
+                segment = AudioSegment(
+                    samples=view,
+                    sample_rate=sample_rate,
+                    speech_start=speech_start,
+                    speech_end=speech_end,
+                )
+                text = transcribe_segment(model, segment)
+                del view, segment
+            finally:
+                shm.close()
+            results.put((seq, text, None))
+        except Exception as e:
+            results.put((seq, "", repr(e)))
+
+
+class STTPool:
+    """K STT processes fed through multiprocessing.shared_memory.
+
+    submit copies a segment's samples into a fresh shared-memory block and
+    sends only its name and length to the workers; the collector thread frees
+    each block once its result is back and re-orders results by sequence
+    number, so captions keep the order segments were queued in.
+
+    Each worker has its own job queue and segments go to the least busy one,
+    so the collector knows what every process holds: a worker that dies (or
+    sits on a job for job_timeout seconds) is restarted and its segments
+    come out empty instead of stalling the ones behind them.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        model_size: str = "small.en",
+        compute_type: str = "int8",
+        cpu_threads: int = 0,
+        max_in_flight: int = 0,
+        job_timeout: float = 120.0,
+        target=_pool_worker,
+    ):
+        self.workers = max(1, int(workers))
+        self.model_size = model_size
+        self.compute_type = compute_type
+        # by default split the cores evenly between the worker processes
+        self.cpu_threads = cpu_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.job_timeout = job_timeout
+        self._target = target
+
+        ctx = mp.get_context("spawn")
+        self._ctx = ctx
+        self.results = ctx.Queue()
+        self._processes = [None] * self.workers
+        self._jobs = [None] * self.workers  # per-worker job queues
+        self._ready = [None] * self.workers  # set once the worker's model loaded
+        self._ready_at = [None] * self.workers  # when the collector saw it ready
+        self._assigned = [set() for _ in range(self.workers)]  # seqs per worker
+        # bounds shared memory held by queued segments (backpressure on submit)
+        self._slots = threading.Semaphore(max_in_flight or self.workers * 2)
+
+        self._lock = threading.Lock()
+        # seq -> (segment, shared memory, worker index, submitted at)
+        self._pending: dict[
+            int, tuple[AudioSegment, shared_memory.SharedMemory, int, float]
+        ] = {}
+        self._done: dict[int, tuple[AudioSegment, str]] = {}
+        self._next_seq = 0  # next sequence number to hand out
+        self._next_emit = 0  # next sequence number to emit
+        self._collector = None
+
+    def start(self):
+        for i in range(self.workers):
+            self._spawn(i)
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def _spawn(self, i: int):
+        self._jobs[i] = self._ctx.Queue()
+        self._ready[i] = self._ctx.Event()
+        self._ready_at[i] = None
+        p = self._ctx.Process(
+            target=self._target,
+            args=(
+                i,
+                self.model_size,
+                self.compute_type,
+                self.cpu_threads,
+                self._jobs[i],
+                self.results,
+                self._ready[i],
+            ),
+            daemon=True,
+        )
+        p.start()
+        self._processes[i] = p
+
+    def wait_ready(self):
+        """Block until every worker has loaded its model."""
+        while not all(ready.is_set() for ready in self._ready):
+            time.sleep(0.1)
+
+    def stop(self):
+        for jobs in self._jobs:
+            jobs.put(None)
+        for p in self._processes:
+            p.join(timeout=5.0)
+        self.results.put(None)
+        if self._collector is not None:
+            self._collector.join(timeout=1.0)
+
+    def submit(self, segment: AudioSegment) -> int:
+        samples = np.ascontiguousarray(segment.samples, dtype=np.float32)
+        self._slots.acquire()
+        shm = shared_memory.SharedMemory(create=True, size=max(1, samples.nbytes))
+        np.ndarray(samples.shape, dtype=np.float32, buffer=shm.buf)[:] = samples
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            i = min(range(self.workers), key=lambda w: len(self._assigned[w]))
+            self._assigned[i].add(seq)
+            self._pending[seq] = (segment, shm, i, time.monotonic())
+            jobs = self._jobs[i]
+        jobs.put(
+            (
+                seq,
+                shm.name,
+                samples.shape[0],
+                segment.sample_rate,
+                segment.speech_start,
+                segment.speech_end,
+            )
+        )
+        return seq
+
+    def _collect(self):
+        while True:
+            try:
+                item = self.results.get(timeout=1.0)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            if item is None:
+                return
+            self._finish(*item)
+            self._check_workers()
+
+    def _finish(self, seq: int, text: str, error):
+        with self._lock:
+            entry = self._pending.pop(seq, None)
+            if entry is None:
+                # already given up on (its worker was restarted)
+                return
+            segment, shm, i, _ = entry
+            self._assigned[i].discard(seq)
+        shm.close()
+        shm.unlink()
+        self._slots.release()
+        if error is not None:
+            print(f"[STT-POOL] Error processing segment {seq}: {error}")
+
+        with self._lock:
+            self._done[seq] = (segment, text)
+            ready = []
+            while self._next_emit in self._done:
+                ready.append(self._done.pop(self._next_emit))
+                self._next_emit += 1
+        for segment, text in ready:
+            emit_transcript(segment, text)
+
+    def _check_workers(self):
+        """Restart dead or hung workers; their segments finish empty. A job
+        only starts counting toward job_timeout once its worker has loaded
+        the model, and a worker runs its jobs in order: only the oldest can
+        be stuck.
+        """
+        now = time.monotonic()
+        for i, p in enumerate(self._processes):
+            if self._ready_at[i] is None and self._ready[i].is_set():
+                self._ready_at[i] = now
+            with self._lock:
+                lost = sorted(self._assigned[i])
+                started = self._pending[lost[0]][3] if lost else None
+            hung = (
+                started is not None
+                and self._ready_at[i] is not None
+                and now - max(started, self._ready_at[i]) > self.job_timeout
+            )
+            if p.is_alive() and not hung:
+                continue
+            if hung:
+                print(
+                    f"[STT-POOL] Worker {i} stuck for {self.job_timeout:.0f}s, "
+                    "killing it"
+                )
+                p.kill()
+                p.join(timeout=5.0)
+            else:
+                print(
+                    f"[STT-POOL] Worker {i} died (exit code {p.exitcode}), restarting"
+                )
+            with self._lock:
+                # jobs submitted from here on go to the new process
+                lost = sorted(self._assigned[i])
+                self._spawn(i)
+            for seq in lost:
+                self._finish(seq, "", "worker lost")
+
+
+def _reject_model_requests():
+    """The pool keeps the model its workers loaded: answer model changes from
+    the GUI with a log line instead of letting them pile up.
+    """
+    while True:
+        model, compute_type = state.stt_model_requests.get()
+        print(
+            f"[STT] Model change to {model} ({compute_type}) not supported "
+            f"with workers > 1, still using {STTSettings.model}"
+        )
+
+
+def run_stt_pool():
+    pool = STTPool(
+        STTSettings.workers,
+        model_size=STTSettings.model,
+        compute_type=STTSettings.compute_type,
+        cpu_threads=STTSettings.cpu_threads,
+        job_timeout=STTSettings.job_timeout,
+    )
+    pool.start()
+    print(f"[STT] Pool of {pool.workers} workers started.")
+    threading.Thread(target=_reject_model_requests, daemon=True).start()
+    pool.wait_ready()
+    timing.mark("Whisper ready")
+    mark_pipeline_ready()
+
+    while True:
+        # whatever is queued, minus partials a newer hypothesis already replaced
+        for segment in drop_superseded(collect_batch(pool.workers * 2, 0)):
+            pool.submit(segment)
@@ -0,0 +1,335 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional
+
+from models.translator_settings import TranslatorSettings
+
+API_URL = "https://api.mymemory.translated.net/get"
+
+
+# ---------------------------
+# Backends de traducción
+# ---------------------------
+class TranslatorBackend:
+    """Translates a batch of lines; returns one translation per line, in order.
+
+    timeout bounds the whole call for remote backends (local ones ignore it).
+    """
+
+    def translate_batch(
+        self, texts: list[str], from_lang: str, to_lang: str, timeout: float = 10
+    ) -> list[str]:
+        raise NotImplementedError
+
+
+class MyMemoryBackend(TranslatorBackend):
+    """The MyMemory HTTP API, through one pooled requests.Session.
+
+    A batch goes out as a single query joined with separator; if the engine
+    doesn't keep the separators (the line count differs), each line is sent
+    on its own instead.
+    """
+
+    def __init__(self, separator: str = "\n", max_connections: int = 4):
+        self.separator = separator
+        self.max_connections = max_connections
+        self._session = None
+        self._lock = threading.Lock()
+
+    def session(self):
+        """One requests.Session for every call: keep-alive connections are
+        reused instead of paying a TCP+TLS handshake per line.
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        with self._lock:
+            if self._session is None:
+                self._session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1, pool_maxsize=self.max_connections
+                )
+                self._session.mount("https://", adapter)
+                self._session.mount("http://", adapter)
+        return self._session
+
+    def translate_batch(self, texts, from_lang, to_lang, timeout=10):
+        langpair = f"{from_lang}|{to_lang}"
+        sep = self.separator
+        if len(texts) > 1:
+            joined = self.request(sep.join(texts), langpair, timeout)
+            parts = [part.strip() for part in joined.split(sep.strip() or sep)]
+            if len(parts) == len(texts):
+                return parts
+            print(
+                f"[TRANSLATOR] Got {len(parts)} lines back for {len(texts)}, "
+                "translating them one by one"
+            )
+        return [self.request(text, langpair, timeout) for text in texts]
+
+    def request(self, text: str, langpair: str, timeout: float = 10) -> str:
+        params = {
+            "q": text,
+            "langpair": langpair,
+        }
+
+        r = self.session().get(API_URL, params=params, timeout=timeout)
+        r.raise_for_status()
+
+        data = r.json()
+
+        if data.get("responseStatus") != 200:
+            raise RuntimeError(f"Translation failed: {data}")
+
+        return data["responseData"]["translatedText"]
+
+
+class CTranslate2Backend(TranslatorBackend):
+    """Offline translation with a CTranslate2 OPUS-MT (Marian) model on CPU.
+
+    models maps a langpair ("en|es") to a converted model directory, e.g.
+    `ct2-transformers-converter --model Helsinki-NLP/opus-mt-en-es
+    --output_dir translation_models/opus-mt-en-es --copy_files source.spm
+    target.spm`. Lines are tokenized with its source.spm (plus the "</s>"
+    Marian expects at the end) and translations decoded with target.spm,
+    via `sentencepiece`. Models load on first use; a batch is translated in
+    one translate_batch call.
+    """
+
+    def __init__(
+        self,
+        models: dict[str, str],
+        threads: int = 0,
+        compute_type: str = "int8",
+        beam_size: int = 2,
+        max_batch: int = 32,
+    ):
+        self.models = models
+        self.threads = threads
+        self.compute_type = compute_type
+        self.beam_size = beam_size
+        self.max_batch = max_batch
+        # langpair -> (ctranslate2.Translator, source and target SentencePiece)
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def _load(self, langpair: str):
+        with self._lock:
+            if langpair not in self._loaded:
+                import ctranslate2
+                import sentencepiece as spm
+
+                path = self.models.get(langpair)
+                if path is None:
+                    raise ValueError(f"No local translation model for {langpair}")
+                print(f"[TRANSLATOR] Loading local model {path}...")
+                translator = ctranslate2.Translator(
+                    path,
+                    device="cpu",
+                    compute_type=self.compute_type,
+                    inter_threads=1,
+                    intra_threads=self.threads,
+                )
+                source = spm.SentencePieceProcessor(
+                    model_file=os.path.join(path, "source.spm")
+                )
+                target = spm.SentencePieceProcessor(
+                    model_file=os.path.join(path, "target.spm")
+                )
+                self._loaded[langpair] = (translator, source, target)
+            return self._loaded[langpair]
+
+    def translate_batch(self, texts, from_lang, to_lang, timeout=10):
+        translator, source, target = self._load(f"{from_lang}|{to_lang}")
+        tokens = [pieces + ["</s>"] for pieces in source.encode(texts, out_type=str)]
+        results = translator.translate_batch(
+            tokens,
+            max_batch_size=self.max_batch,
+            beam_size=self.beam_size,
+        )
+        return [target.decode(r.hypotheses[0]).strip() for r in results]
+
+
+class BackendUnavailable(RuntimeError):
+    """Neither the primary nor a secondary backend could translate."""
+
+
+class ResilientBackend(TranslatorBackend):
+    """Bounded-latency wrapper around a remote backend.
+
+    Every attempt gets attempt_timeout seconds. If the first one hasn't
+    answered after the p95 of recent latencies (hedge_min_delay at least,
+    hedge_initial_delay until there are enough samples), an identical hedge
+    request goes out and the first success wins.
+
+    After `failures` failed calls in a row the circuit opens: for cooldown
+    seconds calls go straight to the secondary backend (or raise
+    BackendUnavailable when there is none), then a single trial call decides
+    whether it closes again.
+
+    At most max_attempts attempts run at once; size the primary's connection
+    pool to match, or the extra ones wait for a free connection.
+    """
+
+    def __init__(
+        self,
+        primary: TranslatorBackend,
+        secondary: Optional[TranslatorBackend] = None,
+        attempt_timeout: float = 2.5,
+        hedge: bool = True,
+        hedge_min_delay: float = 0.2,
+        hedge_initial_delay: float = 0.8,
+        failures: int = 3,
+        cooldown: float = 30.0,
+        max_attempts: int = 8,
+    ):
+        self.primary = primary
+        self.secondary = secondary
+        self.attempt_timeout = attempt_timeout
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_initial_delay = hedge_initial_delay
+        self.failures = failures
+        self.cooldown = cooldown
+        self._latencies = deque(maxlen=200)
+        self._failed = 0  # failed calls in a row
+        self._open_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_attempts)
+
+    def hedge_delay(self) -> float:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < 20:
+            return self.hedge_initial_delay
+        p95 = samples[int(0.95 * (len(samples) - 1))]
+        return min(max(p95, self.hedge_min_delay), self.attempt_timeout)
+
+    def translate_batch(self, texts, from_lang, to_lang, timeout=10):
+        if self._allow():
+            try:
+                result = self._hedged(
+                    texts, from_lang, to_lang, min(timeout, self.attempt_timeout)
+                )
+            except Exception as e:
+                self._record_failure(e)
+            else:
+                self._record_success()
+                return result
+        if self.secondary is not None:
+            return self.secondary.translate_batch(texts, from_lang, to_lang, timeout)
+        raise BackendUnavailable("translation API unavailable")
+
+    def _hedged(self, texts, from_lang, to_lang, timeout: float) -> list[str]:
+        started = time.monotonic()
+        ends = started + timeout
+
+        def attempt():
+            t0 = time.monotonic()
+            result = self.primary.translate_batch(
+                texts, from_lang, to_lang, max(0.1, ends - t0)
+            )
+            return result, time.monotonic() - t0
+
+        pending = {self._pool.submit(attempt)}
+        if self.hedge:
+            done, _ = wait(pending, timeout=min(self.hedge_delay(), timeout))
+            if not done:
+                pending.add(self._pool.submit(attempt))
+
+        error = None
+        while pending:
+            done, pending = wait(
+                pending,
+                timeout=max(0.0, ends - time.monotonic()),
+                return_when=FIRST_COMPLETED,
+            )
+            if not done:
+                raise TimeoutError(f"no answer within {timeout:.1f}s")
+            for future in done:
+                if future.exception() is None:
+                    result, latency = future.result()
+                    with self._lock:
+                        self._latencies.append(latency)
+                    return result
+                error = future.exception()
+        raise error
+
+    def _allow(self) -> bool:
+        with self._lock:
+            if self._failed < self.failures:
+                return True
+            if time.monotonic() < self._open_until or self._probing:
+                return False
+            # half-open: let one trial call through
+            self._probing = True
+            return True
+
+    def _record_success(self):
+        with self._lock:
+            if self._failed >= self.failures:
+                print("[TRANSLATOR] API healthy again, circuit closed")
+            self._failed = 0
+            self._probing = False
+
+    def _record_failure(self, error: Exception):
+        with self._lock:
+            self._failed += 1
+            self._probing = False
+            if self._failed >= self.failures:
+                self._open_until = time.monotonic() + self.cooldown
+                print(
+                    f"[TRANSLATOR] API failing ({error}), circuit open for "
+                    f"{self.cooldown:.0f}s"
+                )
+            else:
+                print(f"[TRANSLATOR] API call failed: {error}")
+
+
+def _max_attempts(cfg) -> int:
+    """Remote attempts that can be running at once: each of the max_in_flight
+    requests, plus its hedge when hedging is on.
+    """
+    return cfg.max_in_flight * (2 if cfg.hedge_enabled else 1)
+
+
+def _create(name: str, cfg) -> TranslatorBackend:
+    if name == "ctranslate2":
+        return CTranslate2Backend(
+            cfg.local_models,
+            threads=cfg.local_threads,
+            compute_type=cfg.local_compute_type,
+            beam_size=cfg.local_beam_size,
+            max_batch=cfg.local_max_batch,
+        )
+    if name == "mymemory":
+        return MyMemoryBackend(cfg.coalesce_separator, _max_attempts(cfg))
+    raise ValueError(f"Unknown translator backend: {name}")
+
+
+def create_backend(cfg=TranslatorSettings) -> TranslatorBackend:
+    """Build the backend selected by cfg.backend ("mymemory" or "ctranslate2").
+
+    The remote API is wrapped in a ResilientBackend, with cfg.secondary_backend
+    as its fallback.
+    """
+    backend = _create(cfg.backend, cfg)
+    if cfg.backend != "mymemory":
+        return backend
+    return ResilientBackend(
+        backend,
+        secondary=(
+            _create(cfg.secondary_backend, cfg) if cfg.secondary_backend else None
+        ),
+        attempt_timeout=cfg.attempt_timeout,
+        hedge=cfg.hedge_enabled,
+        hedge_min_delay=cfg.hedge_min_delay,
+        hedge_initial_delay=cfg.hedge_initial_delay,
+        failures=cfg.breaker_failures,
+        cooldown=cfg.breaker_cooldown,
+        max_attempts=_max_attempts(cfg),
+    )
@@ -0,0 +1,139 @@
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+
+def normalize(text: str) -> str:
+    """Cache key form of a line: NFC, single spaces, no surrounding blanks.
+    Case is kept, since it changes how names and sentences translate.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class TranslationCache:
+    """Two-level translation cache keyed by (normalized text, langpair).
+
+    An LRU dict of memory_entries sits in front of a SQLite table that keeps
+    up to disk_entries rows (least recently used go first). Entries older
+    than ttl seconds count as misses and are deleted. Hits never reach the
+    translation API.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        memory_entries: int = 2048,
+        disk_entries: int = 100_000,
+        ttl: float = 30 * 24 * 3600.0,
+    ):
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()  # (text, langpair) -> (translated, stored_at)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " text TEXT NOT NULL, langpair TEXT NOT NULL, translated TEXT NOT NULL,"
+            " stored_at REAL NOT NULL, used_at REAL NOT NULL,"
+            " PRIMARY KEY (text, langpair))"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS translations_used ON translations (used_at)"
+        )
+        self._db.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._inserts = 0
+        self._purge_expired()
+
+    def get(self, text: str, langpair: str) -> Optional[str]:
+        key = (normalize(text), langpair)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+            row = self._db.execute(
+                "SELECT translated, stored_at FROM translations"
+                " WHERE text = ? AND langpair = ?",
+                key,
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._db.execute(
+                        "DELETE FROM translations WHERE text = ? AND langpair = ?",
+                        key,
+                    )
+                    self._db.commit()
+                self.misses += 1
+                return None
+            self._db.execute(
+                "UPDATE translations SET used_at = ? WHERE text = ? AND langpair = ?",
+                (now, *key),
+            )
+            self._db.commit()
+            self._remember(key, row[0], row[1])
+            self.disk_hits += 1
+            return row[0]
+
+    def put(self, text: str, langpair: str, translated: str):
+        key = (normalize(text), langpair)
+        now = time.time()
+        with self._lock:
+            self._remember(key, translated, now)
+            self._db.execute(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?)",
+                (*key, translated, now, now),
+            )
+            self._inserts += 1
+            # trimming is a scan: do it once every few hundred inserts
+            if self._inserts % 256 == 0:
+                self._trim_disk()
+            self._db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (
+                (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+            ),
+            "memory_entries": len(self._memory),
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _remember(self, key, translated: str, stored_at: float):
+        self._memory[key] = (translated, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _trim_disk(self):
+        self._db.execute(
+            "DELETE FROM translations WHERE rowid IN (SELECT rowid FROM translations"
+            " ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_entries,),
+        )
+
+    def _purge_expired(self):
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM translations WHERE stored_at < ?",
+                (time.time() - self.ttl,),
+            )
+            self._trim_disk()
+            self._db.commit()
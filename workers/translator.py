@@ -1,34 +1,233 @@
-import requests
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import replace
+from typing import Optional
 
 import state
+from models.translator_settings import TranslatorSettings
+from workers.stt import drop_superseded
+from workers.translation_backends import (
+    BackendUnavailable,
+    TranslatorBackend,
+    create_backend,
+)
+from workers.translation_cache import TranslationCache
 
-API_URL = "https://api.mymemory.translated.net/get"
+_cache = None
+_cache_lock = threading.Lock()
+_backend = None
 
 
-def translate_text(text: str, from_lang: str, to_lang: str) -> str:
-    if not text.strip():
-        return ""
+def get_cache():
+    """The shared TranslationCache, opened on first use (None if disabled)."""
+    global _cache
+    if not TranslatorSettings.cache_enabled:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TranslationCache(
+                TranslatorSettings.cache_path,
+                memory_entries=TranslatorSettings.cache_memory_entries,
+                disk_entries=TranslatorSettings.cache_disk_entries,
+                ttl=TranslatorSettings.cache_ttl,
+            )
+    return _cache
 
-    params = {
-        "q": text,
-        "langpair": f"{from_lang}|{to_lang}",
-    }
 
-    r = requests.get(API_URL, params=params, timeout=10)
-    r.raise_for_status()
+def get_backend() -> TranslatorBackend:
+    """The TranslatorBackend chosen in TranslatorSettings.backend."""
+    global _backend
+    with _cache_lock:
+        if _backend is None:
+            _backend = create_backend(TranslatorSettings)
+    return _backend
 
-    data = r.json()
 
-    if data.get("responseStatus") != 200:
-        raise RuntimeError(f"Translation failed: {data}")
+def translate_text(text: str, from_lang: str, to_lang: str, timeout: float = 10) -> str:
+    """Translate through the cache; only misses reach the backend."""
+    return translate_lines([text], from_lang, to_lang, timeout)[0]
 
-    return data["responseData"]["translatedText"]
+
+def translate_lines(
+    texts: list[str],
+    from_lang: str,
+    to_lang: str,
+    timeout: float = 10,
+    store: Optional[list[bool]] = None,
+) -> list[str]:
+    """Translate several lines: cache hits first, then every miss in one
+    translate_batch call of the backend. store says which translations go
+    into the cache (default all); partial captions are one-off prefixes, so
+    they are looked up but never stored.
+    """
+    langpair = f"{from_lang}|{to_lang}"
+    cache = get_cache()
+    results = ["" for _ in texts]
+    misses = []
+    for i, text in enumerate(texts):
+        if not text.strip():
+            continue
+        if cache is not None:
+            cached = cache.get(text, langpair)
+            _report_cache(cache)
+            if cached is not None:
+                results[i] = cached
+                continue
+        misses.append(i)
+    if not misses:
+        return results
+
+    try:
+        translated = get_backend().translate_batch(
+            [texts[i] for i in misses], from_lang, to_lang, timeout
+        )
+    except BackendUnavailable:
+        # API down and no secondary backend: show the original text (uncached)
+        for i in misses:
+            results[i] = texts[i]
+        return results
+    for i, text in zip(misses, translated):
+        results[i] = text
+        if cache is not None and (store is None or store[i]):
+            cache.put(texts[i], langpair, text)
+    return results
+
+
+def _report_cache(cache: TranslationCache):
+    s = cache.stats()
+    lookups = s["memory_hits"] + s["disk_hits"] + s["misses"]
+    if lookups % 100 == 0:
+        print(
+            f"[TRANSLATOR] Cache: {s['hit_rate']:.0%} hits over {lookups} lookups "
+            f"({s['memory_hits']} memory, {s['disk_hits']} disk)"
+        )
+
+
+def take_pending(window: float = 0.0, in_flight: Optional[set] = None) -> list:
+    """Block for one caption, then take the rest already queued, minus the
+    partials a newer caption of the same utterance replaces. Only when a
+    backlog exists (more lines queued, or requests still in_flight) does it
+    wait up to window seconds for more lines to share the requests, so a lone
+    line on an idle translator goes out right away.
+    """
+    captions = [state.transcripted_text.get()]
+    while True:
+        try:
+            captions.append(state.transcripted_text.get_nowait())
+        except queue.Empty:
+            break
+    if len(captions) > 1 or in_flight:
+        deadline = time.monotonic() + window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                captions.append(state.transcripted_text.get(timeout=remaining))
+            except queue.Empty:
+                break
+    return drop_superseded(captions)
+
+
+def group_lines(captions: list, max_bytes: int, sep: str) -> list[list]:
+    """Split captions, in order, into groups translated by one request each:
+    consecutive lines up to max_bytes joined. Empty captions go alone.
+    """
+    groups = []
+    current, size = [], 0
+    for caption in captions:
+        n = len(caption.text.encode("utf-8"))
+        if current and (
+            not caption.text or not current[-1].text or size + len(sep) + n > max_bytes
+        ):
+            groups.append(current)
+            current, size = [], 0
+        size += (len(sep) if current else 0) + n
+        current.append(caption)
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _deliver(order: queue.Queue):
+    """Put one language's translations on state.translated_text in transcript
+    order: wait for its oldest group first, up to the rest of its time budget.
+    """
+    while True:
+        captions, lang, future, deadline = order.get()
+        try:
+            texts = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            print(f"[TRANSLATOR] Timed out, skipped {len(captions)} line(s) ({lang})")
+            continue
+        except Exception as e:
+            print(
+                f"[TRANSLATOR] Error translating {len(captions)} line(s) ({lang}): {e}"
+            )
+            continue
+        for caption, translated in zip(captions, texts):
+            state.translated_text.put(replace(caption, text=translated, lang=lang))
+            if translated:
+                print(f"[TRANSLATOR] Translated ({caption.kind}, {lang}): {translated}")
+
+
+def _submit(
+    captions: list,
+    pool: ThreadPoolExecutor,
+    slots,
+    orders: dict[str, queue.Queue],
+    in_flight: set,
+):
+    budget = TranslatorSettings.request_timeout
+    if TranslatorSettings.coalesce_window > 0:
+        groups = group_lines(
+            captions,
+            TranslatorSettings.max_query_bytes,
+            TranslatorSettings.coalesce_separator,
+        )
+    else:
+        groups = [[caption] for caption in captions]
+    # every group goes out to all target languages at once
+    for group in groups:
+        for lang in TranslatorSettings.target_langs:
+            if not group[0].text:
+                # empty final closing streamed partials: nothing to translate
+                future = Future()
+                future.set_result([""])
+            else:
+                slots.acquire()
+                future = pool.submit(
+                    translate_lines,
+                    [c.text for c in group],
+                    TranslatorSettings.source_lang,
+                    lang,
+                    budget,
+                    [c.kind != "partial" for c in group],
+                )
+                in_flight.add(future)
+                future.add_done_callback(in_flight.discard)
+                future.add_done_callback(lambda _: slots.release())
+            orders[lang].put((group, lang, future, time.monotonic() + budget))
 
 
 def run_translator():
+    pool = ThreadPoolExecutor(max_workers=TranslatorSettings.max_in_flight)
+    # at most max_in_flight requests submitted and not finished yet
+    slots = threading.Semaphore(TranslatorSettings.max_in_flight)
+    in_flight = set()  # those requests' futures
+    # one ordered delivery per language: a slow one never holds up the others
+    orders = {}
+    for lang in TranslatorSettings.target_langs:
+        orders[lang] = queue.Queue()
+        threading.Thread(target=_deliver, args=(orders[lang],), daemon=True).start()
+
     while state.translator_enabled:
-        text = state.transcripted_text.get()
-        if text:
-            translated = translate_text(text, "en", "es")
-            state.translated_text.put(translated)
-            print(f"[TRANSLATOR] Translated: {translated}")
+        try:
+            captions = take_pending(TranslatorSettings.coalesce_window, in_flight)
+            _submit(captions, pool, slots, orders, in_flight)
+        except Exception as e:
+            # one bad batch must not take the translator thread down
+            print(f"[TRANSLATOR] Error: {e}")
@@ -0,0 +1,146 @@
+import os
+
+import numpy as np
+
+from models.segmenter_settings import SegmenterSettings
+
+
+# ---------------------------
+# VAD backends para el Segmenter
+# ---------------------------
+class VADBackend:
+    """Decides which analyzer frames contain speech.
+
+    speech_frames gets the frames [first_frame, first_frame + len(energies))
+    of a CircularBuffer together with their energies (sum of squares) and the
+    energy gate for each of them (frame_threshold, same shape: it follows the
+    adaptive noise floor), and returns one bool per frame.
+    """
+
+    def speech_frames(
+        self,
+        buf,
+        first_frame: int,
+        energies: np.ndarray,
+        frame_threshold: np.ndarray,
+    ) -> np.ndarray:
+        raise NotImplementedError
+
+
+class EnergyVAD(VADBackend):
+    """Default backend: the per-frame energy gate, nothing else."""
+
+    def speech_frames(self, buf, first_frame, energies, frame_threshold):
+        return energies > frame_threshold
+
+
+class OnnxVAD(VADBackend):
+    """Neural VAD run through onnxruntime (Silero, as bundled with faster-whisper).
+
+    The model takes a [seq, context + window] batch of consecutive windows plus
+    LSTM state (h, c) and returns one speech probability per window. Every new
+    window is scored exactly once, all the pending ones in a single session
+    run, carrying the state across calls; probabilities are cached per window
+    so overlapping speech_frames calls cost nothing extra. A frame is speech
+    if it passes the energy gate and a window ending inside it (or the last
+    one before it) reaches the threshold.
+    """
+
+    def __init__(
+        self,
+        model_path: str = "",
+        threshold: float = 0.5,
+        window: int = 512,
+        context: int = 64,
+        max_batch: int = 10000,
+        threads: int = 1,
+    ):
+        import onnxruntime as ort
+
+        if not model_path:
+            from faster_whisper.utils import get_assets_path
+
+            model_path = os.path.join(get_assets_path(), "silero_vad_v6.onnx")
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+        opts.log_severity_level = 4
+        self.session = ort.InferenceSession(
+            model_path, sess_options=opts, providers=["CPUExecutionProvider"]
+        )
+        self.threshold = float(threshold)
+        self.window = int(window)
+        self.context = int(context)
+        self.max_batch = max(1, int(max_batch))
+
+        self._h = np.zeros((1, 1, 128), dtype=np.float32)
+        self._c = np.zeros((1, 1, 128), dtype=np.float32)
+        self._next_window = 0  # índice del siguiente window sin puntuar
+        self._probs = np.zeros(0, dtype=np.float32)  # ring de probabilidades
+
+    def speech_frames(self, buf, first_frame, energies, frame_threshold):
+        speech = energies > frame_threshold
+        if not speech.any():
+            return speech
+
+        fs = buf.frame_size
+        w = self.window
+        frames = first_frame + np.arange(energies.shape[0])
+        # last window ending at or before the end of each frame, and of the frame before
+        last = (frames + 1) * fs // w - 1
+        prev = frames * fs // w - 1
+        self._score_until(buf, int(last[-1]) + 1)
+
+        # windows prev+1..last end inside the frame; if none does, use `last`
+        first = np.minimum(prev + 1, last)
+        span = -(-fs // w) + 1
+        idx = np.minimum(first[:, None] + np.arange(span), last[:, None])
+        probs = self._probs[np.maximum(idx, 0) % self._probs.shape[0]].max(axis=1)
+        return speech & (probs >= self.threshold) & (last >= 0)
+
+    def _score_until(self, buf, end_window: int):
+        """Score windows [_next_window, end_window) in one batched run."""
+        w = self.window
+        if self._probs.shape[0] == 0:
+            self._probs = np.zeros(buf.capacity // w + 2, dtype=np.float32)
+        earliest = -(-max(0, buf.get_latest_total_index() - buf.capacity) // w)
+        if self._next_window < earliest:
+            # fell behind the ring: restart the model state on retained audio
+            self._next_window = earliest
+            self._h[:] = 0
+            self._c[:] = 0
+        n = end_window - self._next_window
+        if n <= 0:
+            return
+
+        lo = self._next_window * w - self.context
+        audio = np.zeros(n * w + self.context, dtype=np.float32)
+        got = buf.read_range_by_total_index(max(0, lo), end_window * w)
+        audio[audio.shape[0] - got.shape[0] :] = got
+        rows = (np.arange(n) * w)[:, None] + np.arange(w + self.context)
+        batch = audio[rows]
+
+        for i in range(0, n, self.max_batch):
+            out, self._h, self._c = self.session.run(
+                None,
+                {"input": batch[i : i + self.max_batch], "h": self._h, "c": self._c},
+            )
+            out = np.asarray(out, dtype=np.float32).reshape(-1)
+            slots = (
+                self._next_window + i + np.arange(out.shape[0])
+            ) % self._probs.shape[0]
+            self._probs[slots] = out
+        self._next_window = end_window
+
+
+def create_vad(cfg: SegmenterSettings) -> VADBackend:
+    """Build the backend selected by cfg.vad_backend ("energy" or "onnx")."""
+    if cfg.vad_backend == "onnx":
+        return OnnxVAD(
+            cfg.vad_model_path,
+            threshold=cfg.vad_threshold,
+            window=cfg.vad_window,
+            context=cfg.vad_context,
+        )
+    return EnergyVAD()
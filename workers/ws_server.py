@@ -0,0 +1,204 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from websockets.asyncio.server import ServerConnection, serve
+from websockets.exceptions import ConnectionClosed
+
+
+class Connection:
+    """One WebSocket client with its own bounded outbound queue.
+
+    send only queues the message (UTF-8 bytes, sent as a text frame); a
+    writer task per connection flushes the queue and waits for that client's
+    socket alone, so a slow reader never delays the others. When max_queue
+    messages are waiting, policy decides: "drop_oldest" drops the oldest,
+    "latest" keeps only the new one and "disconnect" drops the oldest too,
+    but aborts the connection once the oldest unsent message is more than
+    disconnect_after seconds old.
+    """
+
+    def __init__(
+        self,
+        conn_id: int,
+        ws: ServerConnection,
+        max_queue: int = 16,
+        policy: str = "drop_oldest",
+        disconnect_after: float = 5.0,
+    ):
+        if policy not in ("drop_oldest", "latest", "disconnect"):
+            raise ValueError(f"Unknown send policy: {policy}")
+        self.id = conn_id
+        self.ws = ws
+        self.address = ws.remote_address
+        self.max_queue = max_queue
+        self.policy = policy
+        self.disconnect_after = disconnect_after
+        self.sent = 0
+        self.dropped = 0
+        self.too_slow = False  # aborted by the "disconnect" policy
+        self._queue = deque()  # (message, queued_at)
+        self._writing_since = None  # queued_at of the oldest message being written
+        self._wake = asyncio.Event()
+
+    def send(self, message: bytes):
+        if self.ws.transport.is_closing():
+            return
+        now = time.monotonic()
+        if self.policy == "disconnect" and self.lag(now) > self.disconnect_after:
+            self.too_slow = True
+            self.ws.transport.abort()
+            return
+        if len(self._queue) >= self.max_queue:
+            if self.policy == "latest":
+                self.dropped += len(self._queue)
+                self._queue.clear()
+            else:
+                self._queue.popleft()
+                self.dropped += 1
+        self._queue.append((message, now))
+        self._wake.set()
+
+    def lag(self, now: Optional[float] = None) -> float:
+        """Age in seconds of the oldest message the client hasn't taken yet."""
+        oldest = self._writing_since
+        if oldest is None and self._queue:
+            oldest = self._queue[0][1]
+        if oldest is None:
+            return 0.0
+        return (now or time.monotonic()) - oldest
+
+    def stats(self) -> dict:
+        return {
+            "lag": self.lag(),
+            "queued": len(self._queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "buffered": self.ws.transport.get_write_buffer_size(),
+        }
+
+    async def flush(self):
+        """Writer task: sends what is queued, each send waiting until this
+        client's socket drains below the write buffer limit.
+        """
+        while True:
+            if not self._queue:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            messages = list(self._queue)
+            self._queue.clear()
+            self._writing_since = messages[0][1]
+            for message, _ in messages:
+                await self.ws.send(message, text=True)
+            self._writing_since = None
+            self.sent += len(messages)
+
+    def flush_done(self, task: asyncio.Task):
+        # the writer task only ends on its own when the socket died: stop reading
+        if not task.cancelled():
+            task.exception()
+            self.ws.transport.abort()
+
+
+class WebSocketServer:
+    """WebSocket server (the `websockets` asyncio implementation) for text
+    messages.
+
+    All connections live on one event loop in the thread that calls
+    run_forever; on_connect(conn), on_message(conn, text) and on_close(conn)
+    run on that loop too. Other threads hand work over with
+    call_soon_threadsafe. Each connection writes through its own bounded
+    queue (send_queue messages, send_policy, see Connection) and at most
+    write_buffer bytes wait in its socket buffer. A handshake has to finish
+    within open_timeout seconds, and clients that stop answering pings
+    (every ping_interval, ping_timeout to answer) are dropped.
+    """
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 8765,
+        on_connect: Optional[Callable] = None,
+        on_message: Optional[Callable] = None,
+        on_close: Optional[Callable] = None,
+        max_message: int = 64 * 1024,
+        send_queue: int = 16,
+        send_policy: str = "drop_oldest",
+        disconnect_after: float = 5.0,
+        write_buffer: int = 64 * 1024,
+        open_timeout: float = 10.0,
+        ping_interval: float = 20.0,
+        ping_timeout: float = 20.0,
+    ):
+        self.host = host
+        self.port = port
+        self.on_connect = on_connect
+        self.on_message = on_message
+        self.on_close = on_close
+        self.max_message = max_message
+        self.send_queue = send_queue
+        self.send_policy = send_policy
+        self.disconnect_after = disconnect_after
+        self.write_buffer = write_buffer
+        self.open_timeout = open_timeout
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.connections: dict[int, Connection] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.ready = threading.Event()
+        self._ids = itertools.count(1)
+
+    def run_forever(self):
+        asyncio.run(self._serve())
+
+    def call_soon_threadsafe(self, fn: Callable, *args):
+        self.ready.wait()
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        async with serve(
+            self._handle,
+            self.host,
+            self.port,
+            # the same bytes go to every client: no per-connection deflate
+            compression=None,
+            open_timeout=self.open_timeout,
+            ping_interval=self.ping_interval,
+            ping_timeout=self.ping_timeout,
+            max_size=self.max_message,
+            write_limit=self.write_buffer,
+        ) as server:
+            self.ready.set()
+            await server.serve_forever()
+
+    async def _handle(self, ws: ServerConnection):
+        conn = Connection(
+            next(self._ids),
+            ws,
+            max_queue=self.send_queue,
+            policy=self.send_policy,
+            disconnect_after=self.disconnect_after,
+        )
+        self.connections[conn.id] = conn
+        flusher = asyncio.create_task(conn.flush())
+        flusher.add_done_callback(conn.flush_done)
+        try:
+            if self.on_connect:
+                self.on_connect(conn)
+            async for message in ws:
+                if isinstance(message, bytes):
+                    message = message.decode("utf-8", errors="replace")
+                if self.on_message:
+                    self.on_message(conn, message)
+        except ConnectionClosed:
+            pass
+        finally:
+            self.connections.pop(conn.id, None)
+            flusher.cancel()
+            if self.on_close:
+                self.on_close(conn)